@@ -1,39 +1,44 @@
-import pandas as pd
-import numpy as np
-import spacy
 import json
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from transformers import pipeline, AutoModelForSequenceClassification, AutoTokenizer
-import pymongo
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Initialize NLP components
-nlp = spacy.load("en_core_web_md")
-summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-text_generator = pipeline("text-generation", model="gpt2")
+# Share the Python service's lazy importer (and its --startup-report timings)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "python"))
+from lor_recommendation_ai import IMPORT_TIMINGS, _timed_import
 
-# Connect to MongoDB (using same connection as Node.js)
-client = pymongo.MongoClient(os.getenv("MONGO_URI"))
-db = client["lor_system"]  # Use the same database as your Node.js app
+# The Mongo connection is created on first use
+_db = None
+
+def get_db():
+    # Connect to MongoDB (using same connection as Node.js)
+    global _db
+    if _db is None:
+        pymongo = _timed_import("pymongo")
+        client = pymongo.MongoClient(os.getenv("MONGO_URI"))
+        _db = client["lor_system"]  # Use the same database as your Node.js app
+    return _db
 
 class LORRecommendationAI:
     def __init__(self):
+        db = get_db()
         self.template_collection = db["lortemplates"]
         self.student_collection = db["students"]
         self.internship_collection = db["internships"]
         self.placement_collection = db["placements"]
         
-        # Load or create similarity model for template matching
-        self.vectorizer = TfidfVectorizer(stop_words='english')
-        self._load_templates()
+        # Similarity model for template matching is built on first use
+        self.vectorizer = None
+        self.templates = None
+        self.template_vectors = None
     
     def _load_templates(self):
         """Load all LOR templates and prepare for matching"""
+        TfidfVectorizer = _timed_import("sklearn.feature_extraction.text").TfidfVectorizer
+        self.vectorizer = TfidfVectorizer(stop_words='english')
         templates = list(self.template_collection.find())
         
         if not templates:
@@ -200,7 +205,9 @@ class LORRecommendationAI:
         
         if "error" in student_analysis:
             return {"error": student_analysis["error"]}
-            
+        
+        if self.templates is None:
+            self._load_templates()
         if not self.templates:
             return {"error": "No templates available"}
             
@@ -215,6 +222,7 @@ class LORRecommendationAI:
         query_vector = self.vectorizer.transform([query_text])
         
         # Calculate similarity with all templates
+        cosine_similarity = _timed_import("sklearn.metrics.pairwise").cosine_similarity
         similarities = cosine_similarity(query_vector, self.template_vectors).flatten()
         
         # Get the best matching template
@@ -340,7 +348,11 @@ def api_generate_lor(student_id, template_id=None, purpose="", university="", pr
 
 # Command-line interface for testing
 if __name__ == "__main__":
-    import sys
+    if "--startup-report" in sys.argv:
+        sys.argv.remove("--startup-report")
+        import atexit
+        atexit.register(lambda: print(json.dumps({"startupReport": IMPORT_TIMINGS}), file=sys.stderr))
+    
     if len(sys.argv) < 2:
         print("Usage: python lor_recommendation_ai.py <student_id> [purpose] [university] [program]")
         sys.exit(1)
@@ -0,0 +1,216 @@
+import datetime
+import hashlib
+import sys
+import threading
+import time
+
+from lor_recommendation_ai import _group_by_student, _timed_import, _to_object_id, _version_hash
+
+VIEW_COLLECTION = "student_analysis"
+VIEW_FORMAT = 1
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_POLL_INTERVAL = 300.0  # seconds
+DEFAULT_DEBOUNCE = 2.0         # seconds between change-stream driven refreshes
+
+VIEW_INDEXES = ([("studentId", 1)], [("analysis.primaryField", 1)], [("analysis.strengths", 1)])
+
+
+class AnalysisView:
+    """analyze_student results materialized in the student_analysis collection
+
+    Each document holds one student's analysis with two stamps: sourceVersion
+    (the same (_id, updatedAt) hash RequestContext.fingerprint computes over
+    the student, internships and placements) and analyzerVersion (keyword
+    tables and options). refresh() recomputes only students whose stamps no
+    longer match; watch() and poll() keep the view current in the background.
+    get() and list() serve entries as stored, so an entry lags an edit by at
+    most the refresher's debounce plus one refresh when change streams are
+    followed, or by the poll interval otherwise.
+    """
+
+    def __init__(self, recommender, collection=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.recommender = recommender
+        self.collection = collection if collection is not None else \
+            recommender.student_collection.database[VIEW_COLLECTION]
+        self.batch_size = batch_size
+        self.analyzer_version = _analyzer_version(recommender)
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._threads = []
+
+    def ensure_indexes(self):
+        for keys in VIEW_INDEXES:
+            self.collection.create_index(keys)
+
+    # ------------------------------------------------------------------
+    # Reads
+
+    def get(self, student_id):
+        """The stored analysis for one student (one query), or None when it is not in the view"""
+        document = self.collection.find_one(
+            {"_id": _to_object_id(student_id), "analyzerVersion": self.analyzer_version}, {"analysis": 1})
+        return document["analysis"] if document else None
+
+    def store(self, student_id, analysis, source_version):
+        """Write one freshly computed analysis into the view"""
+        self.collection.update_one(
+            {"_id": _to_object_id(student_id)},
+            {"$set": {"studentId": str(student_id), "analysis": analysis, "sourceVersion": source_version,
+                      "analyzerVersion": self.analyzer_version, "computedAt": datetime.datetime.utcnow()}},
+            upsert=True)
+
+    def list(self, primary_field=None, strength=None, skip=0, limit=100):
+        """Page through materialized analyses, filtered on indexed fields
+
+        Entries are served as stored, so they can lag recent edits until the
+        watcher or poller refreshes them (computedAt says when).
+        """
+        query = {"analyzerVersion": self.analyzer_version}
+        if primary_field:
+            query["analysis.primaryField"] = primary_field
+        if strength:
+            query["analysis.strengths"] = strength
+        cursor = self.collection.find(query, {"studentId": 1, "analysis": 1, "computedAt": 1}) \
+            .sort("studentId", 1).skip(skip).limit(limit)
+        return [dict(d["analysis"], studentId=d["studentId"], computedAt=d.get("computedAt")) for d in cursor]
+
+    # ------------------------------------------------------------------
+    # Maintenance
+
+    def refresh(self, student_ids):
+        """Recompute the given students whose source or analyzer version changed
+
+        Returns {"checked", "recomputed", "removed"}.
+        """
+        UpdateOne = _timed_import("pymongo").UpdateOne
+        from data_access import students_filter
+
+        r = self.recommender
+        ids = list(dict.fromkeys(str(i) for i in student_ids if _to_object_id(i) is not None))
+        if not ids:
+            return {"checked": 0, "recomputed": 0, "removed": 0}
+        object_ids = [_to_object_id(i) for i in ids]
+
+        # Current source versions from updatedAt-only projections, three queries for the whole batch
+        versions = {"updatedAt": 1}
+        related_versions = {"studentId": 1, "updatedAt": 1}
+        students = {str(s["_id"]): s for s in r.student_collection.find({"_id": {"$in": object_ids}}, versions)}
+        internships = _group_by_student(r.internship_collection.find(students_filter(ids), related_versions))
+        placements = _group_by_student(r.placement_collection.find(students_filter(ids), related_versions))
+        current = {i: _version_hash([students[i]], internships.get(i, []), placements.get(i, []))
+                   for i in ids if i in students}
+
+        stored = {str(d["_id"]): d for d in self.collection.find(
+            {"_id": {"$in": object_ids}}, {"sourceVersion": 1, "analyzerVersion": 1})}
+        stale = [i for i, version in current.items()
+                 if i not in stored or stored[i].get("sourceVersion") != version
+                 or stored[i].get("analyzerVersion") != self.analyzer_version]
+        removed = [_to_object_id(i) for i in ids if i not in students and i in stored]
+
+        if stale:
+            now = datetime.datetime.utcnow()
+            analyses = r.analyze_students(stale, vectorized=True)
+            operations = [
+                UpdateOne({"_id": _to_object_id(i)},
+                          {"$set": {"studentId": i, "analysis": analysis, "sourceVersion": current[i],
+                                    "analyzerVersion": self.analyzer_version, "computedAt": now}},
+                          upsert=True)
+                for i, analysis in zip(stale, analyses) if "error" not in analysis
+            ]
+            if operations:
+                self.collection.bulk_write(operations, ordered=False)
+        if removed:
+            self.collection.delete_many({"_id": {"$in": removed}})
+        return {"checked": len(ids), "recomputed": len(stale), "removed": len(removed)}
+
+    def rebuild(self):
+        """Check every student (and drop view entries for deleted ones), in batches"""
+        totals = {"checked": 0, "recomputed": 0, "removed": 0}
+        started = time.perf_counter()
+
+        def add(counts):
+            for key in totals:
+                totals[key] += counts[key]
+
+        batch = []
+        for student in self.recommender.student_collection.find({}, {"_id": 1}).batch_size(self.batch_size):
+            batch.append(str(student["_id"]))
+            if len(batch) >= self.batch_size:
+                add(self.refresh(batch))
+                batch = []
+        if batch:
+            add(self.refresh(batch))
+
+        # Entries whose student no longer exists
+        orphans = []
+        for document in self.collection.find({}, {"_id": 1}).batch_size(self.batch_size):
+            orphans.append(str(document["_id"]))
+            if len(orphans) >= self.batch_size:
+                add(self.refresh(orphans))
+                orphans = []
+        if orphans:
+            add(self.refresh(orphans))
+
+        totals["seconds"] = round(time.perf_counter() - started, 3)
+        return totals
+
+    def watch(self, debounce=DEFAULT_DEBOUNCE):
+        """Follow change streams and refresh the affected students (replica sets only)
+
+        A server that already follows these streams should pass on_change as
+        a listener to data_access.watch_student_changes and call
+        start_refresher() instead.
+        """
+        from data_access import watch_student_changes
+        self._threads.extend(watch_student_changes(self.recommender.student_collection.database,
+                                                   [self.on_change], name="analysis-view-watch"))
+        self.start_refresher(debounce)
+        return self._threads
+
+    def on_change(self, student_id):
+        """Queue one student (None: every student) for the next refresh"""
+        with self._pending_lock:
+            self._pending.add(student_id)
+
+    def start_refresher(self, debounce=DEFAULT_DEBOUNCE):
+        """Background thread that refreshes queued students every debounce seconds"""
+        return self._start("analysis-view-refresh", self._drain, debounce)
+
+    def poll(self, interval=DEFAULT_POLL_INTERVAL):
+        """Rebuild (only recomputing stale students) now and then every interval seconds"""
+        def loop():
+            while True:
+                self._safely(self.rebuild)
+                time.sleep(interval)
+        return self._start("analysis-view-poll", loop)
+
+    def _drain(self, debounce):
+        while True:
+            time.sleep(debounce)
+            with self._pending_lock:
+                pending, self._pending = self._pending, set()
+            if None in pending:
+                self._safely(self.rebuild)
+            elif pending:
+                self._safely(self.refresh, list(pending))
+
+    def _safely(self, function, *args):
+        try:
+            return function(*args)
+        except Exception as e:
+            print(f"Warning: analysis view refresh failed ({e})", file=sys.stderr)
+
+    def _start(self, name, target, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return thread
+
+
+def _analyzer_version(recommender):
+    """Changes whenever the analysis rules' inputs change (keyword tables, options)"""
+    with open(recommender.keywords.path, "rb") as f:
+        keywords = f.read()
+    digest = hashlib.sha1(keywords)
+    digest.update(f"{VIEW_FORMAT}:{recommender.text_nlp}".encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,219 @@
+"""Time the recommender's hot paths against a synthetic cohort
+
+    python benchmarks/run_benchmarks.py --scale medium --output results.json
+    python benchmarks/run_benchmarks.py --students 5000 --templates 200 --baseline baseline.json
+
+Data is generated deterministically (see synthetic.py) and loaded into
+mongomock by default, so numbers measure this code rather than the network;
+pass --mongo-uri to run against a real (scratch) database instead. Results
+are printed as JSON. --baseline compares against an earlier results file and
+exits with status 1 when any operation regressed beyond --tolerance.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lor_recommendation_ai import LORRecommendationAI  # noqa: E402
+from synthetic import SCALES, generate_cohort, load_cohort  # noqa: E402
+from template_index import TemplateIndex  # noqa: E402
+
+# Compared against the baseline; lower is better for latencies, higher for throughput
+COMPARED_METRICS = ("p50Ms", "p95Ms", "throughputPerSec")
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def peak_alloc_mb(operation, inputs):
+    """Peak traced allocation (Python objects and NumPy buffers) while calling operation on inputs
+
+    Measured in its own pass, after timing, because tracing slows every
+    allocation down; unlike ru_maxrss it starts from zero for each operation.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for value in inputs:
+            operation(value)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 2)
+
+
+def measure(name, operation, inputs, warmup=3, memory_samples=5):
+    """Call operation once per input and summarise the latencies and peak memory"""
+    for value in inputs[:warmup]:
+        operation(value)
+
+    gc.collect()
+    latencies = []
+    started = time.perf_counter()
+    for value in inputs:
+        call_start = time.perf_counter()
+        operation(value)
+        latencies.append((time.perf_counter() - call_start) * 1000)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        "operation": name,
+        "calls": len(latencies),
+        "meanMs": round(statistics.fmean(latencies), 3) if latencies else None,
+        "p50Ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95Ms": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99Ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "maxMs": round(latencies[-1], 3) if latencies else None,
+        "throughputPerSec": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "peakAllocMb": peak_alloc_mb(operation, inputs[:memory_samples]),
+    }
+    print(f"[bench] {name}: p50 {result['p50Ms']} ms, p95 {result['p95Ms']} ms, "
+          f"{result['throughputPerSec']}/s", file=sys.stderr)
+    return result
+
+
+def connect(mongo_uri):
+    if mongo_uri:
+        from pymongo import MongoClient
+        return MongoClient(mongo_uri).get_database()
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("mongomock is required for in-memory benchmarks (pip install mongomock), or pass --mongo-uri")
+    return mongomock.MongoClient().get_database("lor_benchmark")
+
+
+def run(args):
+    students, templates = SCALES[args.scale] if args.scale else (100, 10)
+    students = args.students or students
+    templates = args.templates or templates
+
+    generate_start = time.perf_counter()
+    cohort = generate_cohort(students, templates, seed=args.seed)
+    db = connect(args.mongo_uri)
+    load_cohort(db, cohort)
+    setup_seconds = time.perf_counter() - generate_start
+
+    rng = random.Random(args.seed)
+    student_ids = [str(s["_id"]) for s in cohort["students"]]
+    sample = [rng.choice(student_ids) for _ in range(args.calls)]
+    purposes = [rng.choice(("Graduate School", "Job Application", "Research Position")) for _ in sample]
+    del cohort
+    gc.collect()
+
+    artifact_dir = tempfile.mkdtemp(prefix="lor-bench-")
+    recommender = LORRecommendationAI(db=db)
+    recommender.template_index.artifact_dir = artifact_dir
+
+    results = []
+    repeats = list(range(args.load_repeats))
+    results.append(measure("load_templates.fit", lambda _: TemplateIndex(
+        db["lortemplates"], artifact_dir=None).load(), repeats, warmup=0))
+    recommender.template_index.build_artifact()
+    results.append(measure("load_templates.artifact", lambda _: TemplateIndex(
+        db["lortemplates"], artifact_dir=artifact_dir).load(), repeats, warmup=0))
+
+    recommender.warm()
+    results.append(measure("analyze_student", recommender.analyze_student, sample))
+    pairs = list(zip(sample, purposes))
+    results.append(measure("find_best_template", lambda p: recommender.find_best_template(*p), pairs))
+    results.append(measure("find_best_template.top5", lambda p: recommender.find_best_template(*p, top_k=5), pairs))
+    results.append(measure("generate_lor_content", lambda p: recommender.generate_lor_content(
+        p[0], None, p[1], "Stanford University", "MS in Computer Science"), pairs))
+
+    # Every batch is timed --batch-iterations times so the percentiles rest on more than a handful of calls
+    batches = [sample[i:i + args.batch_size] for i in range(0, len(sample), args.batch_size)]
+    batches = batches * args.batch_iterations
+    results.append(measure("analyze_students.vectorized",
+                           lambda ids: recommender.analyze_students(ids, vectorized=True), batches, warmup=1))
+    results.append(measure("generate_lor_batch", lambda ids: recommender.generate_lor_batch(
+        [{"studentId": i, "purpose": "Graduate School"} for i in ids]), batches, warmup=1))
+
+    return {
+        "scale": {"students": students, "templates": templates, "calls": len(sample),
+                  "batchSize": args.batch_size, "batchIterations": args.batch_iterations, "seed": args.seed},
+        "backend": "mongo" if args.mongo_uri else "mongomock",
+        "python": platform.python_version(),
+        "setupSeconds": round(setup_seconds, 3),
+        "peakRssMb": peak_rss_mb(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Per-operation ratios against baseline; flags changes worse than tolerance"""
+    previous = {r["operation"]: r for r in baseline.get("results", [])}
+    comparison = []
+    for result in report["results"]:
+        before = previous.get(result["operation"])
+        if before is None:
+            continue
+        entry = {"operation": result["operation"], "regressed": False}
+        for metric in COMPARED_METRICS:
+            if not before.get(metric) or result.get(metric) is None:
+                continue
+            ratio = result[metric] / before[metric]
+            entry[metric] = {"baseline": before[metric], "current": result[metric], "ratio": round(ratio, 3)}
+            worse = ratio < 1 - tolerance if metric == "throughputPerSec" else ratio > 1 + tolerance
+            entry["regressed"] = entry["regressed"] or worse
+        comparison.append(entry)
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the LOR recommender on synthetic data")
+    parser.add_argument("--scale", choices=SCALES, help="Preset cohort size (small, medium, large)")
+    parser.add_argument("--students", type=int, help="Number of students (overrides --scale)")
+    parser.add_argument("--templates", type=int, help="Number of templates (overrides --scale)")
+    parser.add_argument("--calls", type=int, default=200, help="Timed calls per operation")
+    parser.add_argument("--batch-size", type=int, default=50, help="Students per batch call")
+    parser.add_argument("--batch-iterations", type=int, default=10, help="Timed passes over the batches")
+    parser.add_argument("--load-repeats", type=int, default=5, help="Timed template index loads")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", help="Benchmark against this (scratch!) database instead of mongomock")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+
+    regressed = False
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+        regressed = any(entry["regressed"] for entry in report["comparison"])
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import datetime
+import random
+
+from bson import ObjectId
+
+# Named scales: (students, templates)
+SCALES = {
+    "small": (100, 10),
+    "medium": (10_000, 1_000),
+    "large": (100_000, 10_000),
+}
+
+FIELD_SKILLS = {
+    "web development": ["HTML", "CSS", "JavaScript", "React", "Angular", "Node"],
+    "data science": ["Python", "Statistics", "Machine Learning", "Data Analysis", "R"],
+    "software engineering": ["Java", "C++", "OOP", "Software Design", "Git"],
+    "ai/ml": ["Deep Learning", "Neural Networks", "Artificial Intelligence", "PyTorch"],
+    "cybersecurity": ["Network Security", "Encryption", "Cyber Forensics", "Linux"],
+    "mobile development": ["Android", "iOS", "Swift", "Kotlin", "Flutter"],
+    "cloud computing": ["AWS", "Azure", "Docker", "Kubernetes", "Terraform"],
+}
+POSITIONS = ["Software Intern", "Data Analyst Intern", "Web Developer", "ML Engineer Intern",
+             "Security Analyst", "Android Developer", "Cloud Engineer Intern", "Research Assistant"]
+COMPANIES = ["Infosys", "TCS", "Google", "Microsoft", "Amazon", "Wipro", "Flipkart", "Zoho", "Accenture"]
+ACHIEVEMENTS = ["Led the college coding club", "Organized a national hackathon", "Volunteer at NSS",
+                "Won a state level quiz", "Published a conference paper", "Captain of the cricket team",
+                "Head of the placement committee", "Completed an online certification"]
+PURPOSES = ["Graduate School", "Job Application", "Research Position", "Scholarship", "Internship"]
+DEPARTMENTS = ["Computer Engineering", "Information Technology", "Electronics", "Mechanical"]
+
+TEMPLATE_SENTENCES = [
+    "I am pleased to recommend {{name}} ({{rollNo}}) for the {{program}} program at {{university}}.",
+    "{{name}} has been a student of the {{department}} department with a CGPA of {{cgpa}}.",
+    "Their skills include {{skills}}, which they applied throughout their coursework.",
+    "During internships at {{internships}}, they showed initiative and maturity.",
+    "Their notable achievements include {{achievements}}.",
+    "I have observed their {{strengths}} strengths first hand.",
+    "I am confident {{name}} will excel in {{purpose}}.",
+]
+
+
+def _object_id(rng):
+    # Derived from the seeded generator so runs are reproducible
+    return ObjectId(rng.getrandbits(96).to_bytes(12, "big"))
+
+
+def _date(rng, start_year=2019, end_year=2025):
+    start = datetime.datetime(start_year, 1, 1)
+    return start + datetime.timedelta(days=rng.randrange((end_year - start_year) * 365))
+
+
+def generate_cohort(students=100, templates=10, seed=42):
+    """Synthetic documents for every collection the recommender reads
+
+    Returns {collection name: [documents]}. Internship and placement
+    studentId values are the student's id as a string (the recommender
+    matches both the string and ObjectId forms).
+    """
+    rng = random.Random(seed)
+    fields = list(FIELD_SKILLS)
+
+    student_docs, internship_docs, placement_docs = [], [], []
+    for n in range(students):
+        student_id = _object_id(rng)
+        field = rng.choice(fields)
+        skills = rng.sample(FIELD_SKILLS[field], rng.randint(1, 4)) + rng.sample(
+            FIELD_SKILLS[rng.choice(fields)], rng.randint(0, 2))
+        student_docs.append({
+            "_id": student_id,
+            "name": f"Student {n}",
+            "rollNo": f"R{n:06d}",
+            "email": f"student{n}@example.edu",
+            "semester": rng.randint(1, 8),
+            "program": "B.Tech",
+            "department": {"name": rng.choice(DEPARTMENTS)},
+            "cgpa": round(rng.uniform(5.5, 10.0), 2),
+            "skills": list(dict.fromkeys(skills)),
+            "achievements": rng.sample(ACHIEVEMENTS, rng.randint(0, 3)),
+            "updatedAt": _date(rng),
+        })
+
+        for _ in range(rng.choice((0, 0, 1, 1, 2, 3))):
+            internship_docs.append({
+                "_id": _object_id(rng),
+                "studentId": str(student_id),
+                "company": rng.choice(COMPANIES),
+                "position": rng.choice(POSITIONS),
+                "startDate": _date(rng),
+                "status": rng.choice(("Ongoing", "Completed")),
+                "updatedAt": _date(rng),
+            })
+        if rng.random() < 0.3:
+            placement_docs.append({
+                "_id": _object_id(rng),
+                "studentId": str(student_id),
+                "company": rng.choice(COMPANIES),
+                "position": rng.choice(POSITIONS),
+                "package": f"{rng.randint(4, 40)} LPA",
+                "placementDate": _date(rng),
+                "updatedAt": _date(rng),
+            })
+
+    template_docs = []
+    for n in range(templates):
+        field = rng.choice(fields)
+        purpose = rng.choice(PURPOSES)
+        sentences = rng.sample(TEMPLATE_SENTENCES, rng.randint(3, len(TEMPLATE_SENTENCES)))
+        focus = f"This letter supports a {purpose.lower()} application in {field} ({', '.join(FIELD_SKILLS[field])})."
+        template_docs.append({
+            "_id": _object_id(rng),
+            "title": f"{purpose} - {field.title()} #{n}",
+            "content": " ".join([sentences[0], focus, *sentences[1:]]),
+            "purpose": purpose,
+            "field": field,
+            "isDefault": n == 0,
+            "createdBy": _object_id(rng),
+            "updatedAt": _date(rng),
+        })
+
+    return {
+        "students": student_docs,
+        "internships": internship_docs,
+        "placements": placement_docs,
+        "lortemplates": template_docs,
+    }
+
+
+def load_cohort(db, cohort):
+    """Insert a generated cohort into db, replacing what was there"""
+    for name, documents in cohort.items():
+        db[name].drop()
+        if documents:
+            db[name].insert_many(documents)
@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from lor_recommendation_ai import DEFAULT_MATCH_MODE, MATCH_MODES, LORRecommendationAI, to_json
+
+DEFAULT_CHUNK_SIZE = 25
+
+# Per-process recommender (and polish mode), set up once by the pool initializer
+_worker_recommender = None
+_worker_polish = None
+
+
+def _init_worker(match_mode, polish=None, trace_log=None):
+    # Each worker opens its own MongoClient here; the parent never connects,
+    # so nothing fork-unsafe is inherited
+    global _worker_recommender, _worker_polish
+    if trace_log:
+        from metrics import add_trace_log
+        add_trace_log(trace_log, pid=os.getpid())
+    _worker_recommender = LORRecommendationAI(match_mode=match_mode)
+    _worker_recommender.warm()
+    _worker_polish = polish
+    if polish:
+        from neural_polish import get_polisher
+        get_polisher().warmup(polish)
+
+
+def _generate_chunk(chunk):
+    """Generate one chunk of (index, job) pairs inside a worker process"""
+    recommender = _worker_recommender
+    jobs = [job for _, job in chunk]
+    try:
+        # One $in query per collection for the whole chunk
+        results = recommender.generate_lor_batch(jobs)
+    except Exception:
+        # Isolate the failure: retry job by job so one bad job can't sink the chunk
+        results = []
+        for job in jobs:
+            try:
+                results.append(recommender.generate_lor_content(
+                    job.get("studentId"), job.get("templateId"), job.get("purpose", ""),
+                    job.get("university", ""), job.get("program", ""), filters=job.get("filters")))
+            except Exception as e:
+                results.append({"error": f"{type(e).__name__}: {e}"})
+    if _worker_polish:
+        # One length-bucketed model pass per chunk instead of one per letter
+        from neural_polish import polish_results
+        results = polish_results(results, _worker_polish)
+    return [(index, job, result) for (index, job), result in zip(chunk, results)]
+
+
+def read_jobs(path):
+    """Jobs from a JSON Lines file (one job per line) or a JSON array file"""
+    with open(path, encoding="utf-8") as f:
+        first = f.read(1)
+        f.seek(0)
+        if first == "[":
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def completed_indices(output_path):
+    """Job indices already written to the output file by an earlier run"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["index"])
+            except (ValueError, KeyError):
+                # A line cut short by an interruption; that job is redone
+                continue
+    return done
+
+
+def _truncate_partial_line(output_path, block_size=65536):
+    """Cut a line left unfinished by an interruption off the end of the file
+
+    Otherwise the next appended record would be glued onto the fragment and
+    never be recognised as done.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(position - block_size, 0)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+def bulk_generate(jobs, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, match_mode=DEFAULT_MATCH_MODE,
+                  polish=None, trace_log=None):
+    """Generate letters for many jobs across a process pool
+
+    Results are appended to output_path as JSON Lines ({"index", "job",
+    "result"}) in job order. Jobs already present in the file are skipped,
+    so an interrupted run resumes where it stopped. polish ("summarize" or
+    "expand") runs each chunk's letters through neural_polish. With
+    trace_log, every worker appends its metrics events (tagged with its pid)
+    to that JSON Lines file. Returns a summary dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    _truncate_partial_line(output_path)
+    done = completed_indices(output_path)
+    pending = ((index, job) for index, job in enumerate(jobs) if index not in done)
+
+    summary = {"skipped": len(done), "succeeded": 0, "failed": 0}
+    started = time.perf_counter()
+
+    # Keep a bounded window of chunks in flight and collect them in order
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(match_mode, polish, trace_log)) as pool, \
+            open(output_path, "a", encoding="utf-8") as out:
+        in_flight = deque()
+
+        def submit_next():
+            chunk = list(islice(pending, chunk_size))
+            if chunk:
+                in_flight.append(pool.submit(_generate_chunk, chunk))
+            return bool(chunk)
+
+        while len(in_flight) < workers * 2 and submit_next():
+            pass
+
+        while in_flight:
+            for index, job, result in in_flight.popleft().result():
+                out.write(to_json({"index": index, "job": job, "result": result}) + "\n")
+                summary["failed" if "error" in result else "succeeded"] += 1
+            out.flush()
+            submit_next()
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def bulk_main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="lor_recommendation_ai.py bulk",
+                                     description="Generate letters for many students across all cores")
+    parser.add_argument("jobs", help="JSON Lines (or JSON array) file of {studentId, purpose, university, program}")
+    parser.add_argument("output", help="JSON Lines results file; re-running resumes from it")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Jobs handed to a worker at once")
+    parser.add_argument("--match-mode", choices=MATCH_MODES, default=DEFAULT_MATCH_MODE,
+                        help="How templates are matched to students")
+    parser.add_argument("--polish", choices=("summarize", "expand"), help="Rewrite letters with a local neural model")
+    parser.add_argument("--trace-log", help="Append every worker's metrics events to this JSON Lines file")
+    args = parser.parse_args(argv)
+
+    summary = bulk_generate(read_jobs(args.jobs), args.output, workers=args.workers,
+                            chunk_size=args.chunk_size, match_mode=args.match_mode, polish=args.polish,
+                            trace_log=args.trace_log)
+    print(json.dumps(summary))
+    if summary["failed"]:
+        print(f"Warning: {summary['failed']} job(s) failed; see errors in {args.output}", file=sys.stderr)
@@ -0,0 +1,129 @@
+from lor_recommendation_ai import _timed_import
+
+STRENGTH_ORDER = ("academic", "technical", "practical", "professional", "leadership")
+
+
+class CohortScorer:
+    """Columnar scoring of a whole cohort with the same rules as analyze_student
+
+    Documents are flattened into one DataFrame (one row per student) and every
+    strength rule and field score is computed as a column operation, so ranking
+    or filtering a graduating batch never loops over students in Python.
+    """
+
+    def __init__(self, keyword_tables):
+        self.fields = keyword_tables.fields
+        self.leadership = keyword_tables.leadership
+
+    def score(self, students, internships, placements, leadership=None):
+        """DataFrame of strengths, field scores and primaryField per student
+
+        internships and placements are lists aligned with students, each holding
+        that student's related documents. leadership optionally flags students
+        the text-understanding stage found leadership evidence for.
+        """
+        pd = _timed_import("pandas")
+        np = _timed_import("numpy")
+
+        if not students:
+            return pd.DataFrame(columns=["studentId", "studentName", "primaryField", *STRENGTH_ORDER])
+
+        frame = pd.DataFrame({
+            "studentId": [str(s["_id"]) for s in students],
+            "studentName": [s.get("name", "") for s in students],
+            "cgpa": pd.to_numeric(pd.Series([s.get("cgpa") or None for s in students], dtype=object), errors="coerce"),
+            "skillCount": [len(s["skills"]) if isinstance(s.get("skills"), list) else 0 for s in students],
+            "internshipCount": [len(i) for i in internships],
+            "placementCount": [len(p) for p in placements],
+        })
+        skills_text = pd.Series([" ".join(s["skills"]) if isinstance(s.get("skills"), list) else ""
+                                 for s in students], dtype=object)
+        achievement_text = pd.Series([" ".join(s["achievements"]) if isinstance(s.get("achievements"), list) else ""
+                                      for s in students], dtype=object)
+
+        # Strength rules
+        frame["academic"] = (frame["cgpa"] >= 8.0).fillna(False).astype(bool)
+        frame["technical"] = frame["skillCount"] >= 3
+        frame["practical"] = frame["internshipCount"] > 0
+        frame["professional"] = frame["placementCount"] > 0
+        frame["leadership"] = achievement_text.str.lower().str.contains(self.leadership.search_pattern, regex=True)
+        if leadership is not None:
+            # As in analyze_student, leadership is only judged for students who list achievements
+            has_achievements = np.asarray([isinstance(s.get("achievements"), list) and bool(s["achievements"])
+                                           for s in students], dtype=bool)
+            frame["leadership"] = frame["leadership"] | (np.asarray(leadership, dtype=bool) & has_achievements)
+
+        # Field scores: skills count once per keyword, internships twice
+        field_names = list(self.fields.groups)
+        keyword_fields = np.zeros((len(self.fields.keywords), len(field_names)))
+        for row, keyword in enumerate(self.fields.keywords):
+            for field in self.fields.groups_for(keyword):
+                keyword_fields[row, field_names.index(field)] = 1
+
+        scores = self._presence(skills_text) @ keyword_fields
+
+        owners = [row for row, docs in enumerate(internships) for _ in docs]
+        if owners:
+            texts = pd.Series([f"{i.get('position', '')} {i.get('company', '')}" for docs in internships for i in docs],
+                              dtype=object)
+            per_internship = pd.DataFrame(self._presence(texts) @ keyword_fields * 2)
+            per_student = per_internship.groupby(np.asarray(owners)).sum()
+            scores = scores + per_student.reindex(range(len(students)), fill_value=0).to_numpy()
+
+        for column, field in enumerate(field_names):
+            frame[f"field:{field}"] = scores[:, column]
+
+        # Highest scoring field (first one wins ties), else the department
+        best = np.asarray(field_names, dtype=object)[scores.argmax(axis=1)]
+        fallback = np.asarray([_department_field(s) for s in students], dtype=object)
+        frame["primaryField"] = np.where(scores.max(axis=1) > 0, best, fallback)
+
+        return frame
+
+    def _presence(self, texts):
+        """rows x keywords 0/1 matrix of which keywords occur in each text"""
+        pd = _timed_import("pandas")
+        np = _timed_import("numpy")
+
+        keywords = self.fields.keywords
+        if texts.empty:
+            return np.zeros((0, len(keywords)))
+
+        found = texts.str.lower().str.findall(self.fields.pattern).explode().dropna()
+        if found.empty:
+            return np.zeros((len(texts), len(keywords)))
+        # A long keyword also counts the keywords it contains
+        implied = {k: [k, *self.fields.implied[k]] for k in keywords}
+        found = found.map(implied).explode()
+
+        presence = pd.crosstab(found.index, found.values).reindex(
+            index=range(len(texts)), columns=keywords, fill_value=0)
+        return (presence.to_numpy() > 0).astype(float)
+
+    def analyses(self, frame, students, recommender, insights=None):
+        """Rebuild analyze_student-shaped dicts from a scored frame"""
+        strengths_by_row = [
+            [name for name in STRENGTH_ORDER if flags[name]]
+            for flags in frame[list(STRENGTH_ORDER)].to_dict("records")
+        ]
+        analyses = [
+            {
+                "studentName": student.get("name", ""),
+                "strengths": strengths,
+                "primaryField": primary_field,
+                "recommendations": recommender._generate_recommendations(strengths, student)
+            }
+            for student, strengths, primary_field in zip(students, strengths_by_row, frame["primaryField"])
+        ]
+        for analysis, student_insights in zip(analyses, insights or []):
+            if student_insights is not None:
+                analysis["insights"] = student_insights
+        return analyses
+
+
+def _department_field(student):
+    # Default to student's department or a generic field
+    department = student.get("department", "")
+    if isinstance(department, dict) and "name" in department:
+        return department["name"]
+    return "engineering"
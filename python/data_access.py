@@ -0,0 +1,194 @@
+import datetime
+import os
+import sys
+import threading
+
+from lor_recommendation_ai import ObjectId, _to_object_id
+
+# Only the fields analysis, scoring and rendering read (plus updatedAt for
+# cache fingerprints); uploads, long histories and nested arrays stay on the server
+STUDENT_PROJECTION = {"name": 1, "rollNo": 1, "department": 1, "cgpa": 1, "skills": 1, "achievements": 1,
+                      "updatedAt": 1}
+INTERNSHIP_PROJECTION = {"studentId": 1, "company": 1, "position": 1, "duration": 1, "updatedAt": 1}
+# Placements only count towards the "professional" strength
+PLACEMENT_PROJECTION = {"studentId": 1, "updatedAt": 1}
+VERSION_PROJECTION = {"updatedAt": 1}
+
+# Indexes every access path relies on: collection -> list of key specs
+REQUIRED_INDEXES = {
+    "internships": [[("studentId", 1)]],
+    "placements": [[("studentId", 1)]],
+    # Template polling asks for {"updatedAt": {"$gt": last_synced}}
+    "lortemplates": [[("updatedAt", 1)]],
+    # Letter index catch-up (letter_similarity.LetterIndex.sync) does the same
+    "lors": [[("updatedAt", 1)]],
+    "lorrequests": [[("updatedAt", 1)]],
+}
+
+# Create missing indexes at startup (set LOR_CREATE_INDEXES=0 to only report them)
+CREATE_INDEXES = os.getenv("LOR_CREATE_INDEXES", "1") not in ("0", "false", "no")
+
+
+def student_id_variants(student_id):
+    """Every stored form of a student id: the string and, when valid, the ObjectId
+
+    The Node models store studentId as an ObjectId while older documents hold
+    the string, so related documents are matched on both with one indexed $in.
+    """
+    variants = [str(student_id)]
+    object_id = _to_object_id(student_id)
+    if isinstance(object_id, ObjectId):
+        variants.append(object_id)
+    return variants
+
+
+def student_filter(student_id):
+    """Query for the internships/placements of one student"""
+    return {"studentId": {"$in": student_id_variants(student_id)}}
+
+
+def students_filter(student_ids):
+    """Query for the internships/placements of many students"""
+    variants = []
+    for student_id in dict.fromkeys(str(i) for i in student_ids):
+        variants.extend(student_id_variants(student_id))
+    return {"studentId": {"$in": variants}}
+
+
+def ensure_indexes(db, create=CREATE_INDEXES):
+    """Check the required indexes exist, creating missing ones when allowed
+
+    Returns one {"collection", "keys", "status"} entry per index where status
+    is "present", "created", "missing" or "failed".
+    """
+    report = []
+    for collection_name, specs in REQUIRED_INDEXES.items():
+        collection = db[collection_name]
+        try:
+            existing = [list(info["key"]) for info in collection.index_information().values()]
+        except Exception as e:
+            print(f"Warning: could not list indexes on {collection_name} ({e})", file=sys.stderr)
+            existing = []
+
+        for keys in specs:
+            entry = {"collection": collection_name, "keys": dict(keys)}
+            if any(_same_keys(index_keys, keys) for index_keys in existing):
+                entry["status"] = "present"
+            elif not create:
+                entry["status"] = "missing"
+                print(f"Warning: {collection_name} has no index on {dict(keys)}", file=sys.stderr)
+            else:
+                try:
+                    entry["name"] = collection.create_index(keys)
+                    entry["status"] = "created"
+                except Exception as e:
+                    entry["status"] = "failed"
+                    entry["error"] = str(e)
+                    print(f"Warning: could not create index {dict(keys)} on {collection_name} ({e})", file=sys.stderr)
+            report.append(entry)
+    return report
+
+
+def explain_access_paths(recommender, student_id=None):
+    """explain() summaries for each query the recommender issues
+
+    Uses student_id, or any student, as the sample. Each entry names the
+    access path, the winning plan's stages (IXSCAN vs COLLSCAN) and the
+    documents examined versus returned.
+    """
+    if student_id is None:
+        sample = recommender.student_collection.find_one({}, {"_id": 1})
+        if not sample:
+            return {"error": "No students to explain queries for"}
+        student_id = str(sample["_id"])
+    student_id_obj = _to_object_id(student_id)
+    if student_id_obj is None:
+        return {"error": "Invalid student ID format"}
+
+    paths = [
+        ("student", recommender.student_collection, {"_id": student_id_obj}, STUDENT_PROJECTION),
+        ("internships", recommender.internship_collection, student_filter(student_id), INTERNSHIP_PROJECTION),
+        ("placements", recommender.placement_collection, student_filter(student_id), PLACEMENT_PROJECTION),
+        ("templates.poll", recommender.template_collection, {"updatedAt": {"$gt": datetime.datetime(1970, 1, 1)}}, None),
+        ("templates.ids", recommender.template_collection, {}, {"_id": 1}),
+    ]
+
+    plans = []
+    for name, collection, query, projection in paths:
+        try:
+            explained = collection.find(query, projection).explain()
+        except Exception as e:
+            plans.append({"path": name, "collection": collection.name, "error": str(e)})
+            continue
+        plans.append(dict(_summarize_plan(explained), path=name, collection=collection.name))
+    return {"studentId": student_id, "plans": plans}
+
+
+def _summarize_plan(explained):
+    planner = explained.get("queryPlanner", {})
+    winning = planner.get("winningPlan", {})
+    # Slot-based execution nests the classic plan under queryPlan
+    winning = winning.get("queryPlan", winning)
+
+    stages = []
+    pending = [winning]
+    while pending:
+        stage = pending.pop(0)
+        if not isinstance(stage, dict):
+            continue
+        if "stage" in stage:
+            stages.append(stage["stage"] + (f" {stage['indexName']}" if "indexName" in stage else ""))
+        pending.extend(stage.get("inputStages", []))
+        if "inputStage" in stage:
+            pending.append(stage["inputStage"])
+
+    stats = explained.get("executionStats", {})
+    return {
+        "stages": stages,
+        "usesIndex": any(s.startswith(("IXSCAN", "IDHACK", "EXPRESS")) for s in stages),
+        "nReturned": stats.get("nReturned"),
+        "docsExamined": stats.get("totalDocsExamined"),
+        "keysExamined": stats.get("totalKeysExamined"),
+        "executionTimeMs": stats.get("executionTimeMillis"),
+    }
+
+
+def _same_keys(index_keys, keys):
+    # index_information() may report directions as floats (1.0 == 1)
+    return [tuple(k) for k in index_keys] == [tuple(k) for k in keys]
+
+
+def watch_student_changes(db, listeners, name="student-watch"):
+    """Call every listener with the student id affected by each change
+
+    Follows MongoDB change streams (replica sets only) on students,
+    internships and placements in background threads, one stream per
+    collection however many listeners share it. A deleted internship or
+    placement carries no studentId, so listeners get None ("any student").
+    """
+    def follow(collection_name, student_of):
+        try:
+            with db[collection_name].watch(full_document="updateLookup") as stream:
+                for change in stream:
+                    student_id = student_of(change)
+                    student_id = str(student_id) if student_id is not None else None
+                    for listener in listeners:
+                        try:
+                            listener(student_id)
+                        except Exception as e:
+                            print(f"Warning: {name} listener failed ({e})", file=sys.stderr)
+        except Exception as e:
+            print(f"Warning: {name} stream on {collection_name} stopped ({e})", file=sys.stderr)
+
+    def related_student(change):
+        return (change.get("fullDocument") or {}).get("studentId")
+
+    threads = []
+    for collection_name, student_of in (("students", lambda c: c["documentKey"]["_id"]),
+                                        ("internships", related_student),
+                                        ("placements", related_student)):
+        thread = threading.Thread(target=follow, args=(collection_name, student_of),
+                                  name=f"{name}-{collection_name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
@@ -0,0 +1,107 @@
+import json
+import os
+import re
+import threading
+
+DEFAULT_KEYWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "keywords.json")
+
+# A keyword only matches where it isn't glued to other letters or digits,
+# so "r" no longer matches inside every word. Lookarounds (not \b) keep
+# keywords like "c++" matchable.
+_LEFT = r"(?<![a-z0-9])"
+_RIGHT = r"(?![a-z0-9])"
+
+
+class KeywordMatcher:
+    """Keyword table compiled into one regex that scores every group in a single pass
+
+    groups maps a group name (e.g. a field) to its keywords. With prefix=True
+    keywords are stems ("organiz" matches "organized"); otherwise they must
+    match whole words.
+    """
+
+    def __init__(self, groups, prefix=False):
+        if not isinstance(groups, dict):
+            groups = {None: groups}
+        self.groups = list(groups)
+        self.prefix = prefix
+
+        self._groups_for = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                self._groups_for.setdefault(keyword.lower(), []).append(group)
+
+        # Longest first so multi-word keywords win over their parts
+        keywords = sorted(self._groups_for, key=len, reverse=True)
+        self.keywords = keywords
+        right = "" if prefix else _RIGHT
+        alternatives = "|".join(re.escape(k) for k in keywords)
+        self.pattern = re.compile(_LEFT + "(" + alternatives + ")" + right)
+        # Same match without a capturing group, for pandas str.contains (which
+        # warns on groups it cannot use)
+        self.search_pattern = re.compile(_LEFT + "(?:" + alternatives + ")" + right)
+
+        # Matches don't overlap, so "network security" hides "security";
+        # remember which keywords each keyword contains to credit them too
+        self.implied = {}
+        for keyword in keywords:
+            inner = {k for k in keywords if k != keyword and re.search(_LEFT + re.escape(k) + right, keyword)}
+            self.implied[keyword] = inner
+
+    def matches(self, text):
+        """Set of distinct keywords present in text"""
+        if not text:
+            return set()
+        found = set()
+        for match in self.pattern.finditer(text.lower()):
+            keyword = match.group(1)
+            found.add(keyword)
+            found.update(self.implied[keyword])
+        return found
+
+    def groups_for(self, keyword):
+        return self._groups_for[keyword]
+
+    def any(self, text):
+        return bool(text) and self.pattern.search(text.lower()) is not None
+
+    def score(self, text, weight=1, scores=None):
+        """Add weight to a group for every distinct keyword of it found in text"""
+        if scores is None:
+            scores = {group: 0 for group in self.groups}
+        for keyword in self.matches(text):
+            for group in self._groups_for[keyword]:
+                scores[group] += weight
+        return scores
+
+
+class KeywordTables:
+    """Keyword tables used by student analysis, loaded from a JSON data file"""
+
+    def __init__(self, path=None):
+        path = path or os.getenv("LOR_KEYWORDS_PATH") or DEFAULT_KEYWORDS_PATH
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+
+        self.path = path
+        self.fields = _build(config["fields"])
+        self.leadership = _build(config["leadership"])
+        # Role words recognised by the spaCy text-understanding stage
+        self.roles = _build(config["roles"]) if "roles" in config else None
+
+
+def _build(table):
+    return KeywordMatcher(table["keywords"], prefix=table.get("match") == "prefix")
+
+
+_tables = None
+_tables_lock = threading.Lock()
+
+
+def get_keyword_tables():
+    """Shared keyword tables, compiled on first use"""
+    global _tables
+    with _tables_lock:
+        if _tables is None:
+            _tables = KeywordTables()
+    return _tables
@@ -0,0 +1,347 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+from lor_recommendation_ai import CACHE_DIR, _timed_import
+from metrics import METRICS
+
+DUPLICATE_THRESHOLD = float(os.getenv("LOR_DUPLICATE_THRESHOLD", "0.8"))
+NUM_PERM = int(os.getenv("LOR_MINHASH_PERMUTATIONS", "128"))
+SHINGLE_SIZE = int(os.getenv("LOR_SHINGLE_SIZE", "5"))  # words
+INDEX_PATH = os.path.join(CACHE_DIR, "letter_index") if CACHE_DIR else None
+SYNC_INTERVAL = 30.0  # seconds between catch-up queries against the stored letters
+INDEX_FORMAT = 2
+
+# Collections holding letters, and the field with the letter text
+STORED_LETTERS = (("lors", "lorDocument"), ("lorrequests", "generatedContent"))
+
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Hash coefficients stay below 2**32 like the shingle hashes, so a*x + b
+# stays below 2**64 and never wraps around in uint64
+_MAX_COEFFICIENT = 1 << 32
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+class LetterIndex:
+    """MinHash signatures of letters, banded into an LSH table
+
+    Letters are compared on sets of word shingles. Each letter's num_perm
+    minimum hashes are split into bands; letters sharing any whole band land
+    in the same bucket and become candidates, which are then checked against
+    the estimated Jaccard similarity. Queries and inserts only touch the
+    buckets of one letter, never the whole index.
+    """
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        np = _timed_import("numpy")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+
+        state = np.random.RandomState(seed)
+        self._a = state.randint(1, _MAX_COEFFICIENT, size=num_perm, dtype=np.uint64)
+        self._b = state.randint(0, _MAX_COEFFICIENT, size=num_perm, dtype=np.uint64)
+
+        self.signatures = {}  # key -> uint64 array of num_perm minimum hashes
+        self._buckets = [{} for _ in range(self.bands)]  # band -> band bytes -> set of keys
+        self.synced_at = None  # newest stored-letter updatedAt seen by sync()
+        self._last_sync = 0.0
+        self.dirty = False  # changed since the last save()
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def signature(self, text):
+        np = _timed_import("numpy")
+        shingles = _shingles(text, self.shingle_size)
+        if not shingles:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # Universal hashing (a*x + b) mod the Mersenne prime 2**61 - 1, one column per permutation
+        permuted = ((hashes[:, None] * self._a + self._b) % np.uint64(_MERSENNE)) & np.uint64(_MAX_HASH)
+        return permuted.min(axis=0)
+
+    def add(self, key, text):
+        """Insert or replace one letter"""
+        self.add_signature(key, self.signature(text))
+
+    def add_many(self, letters):
+        """Insert (key, text) pairs"""
+        with METRICS.stage("minhash"):
+            for key, text in letters:
+                self.add(key, text)
+
+    def add_signature(self, key, signature):
+        with self._lock:
+            if key in self.signatures:
+                self.remove(key)
+            self.signatures[key] = signature
+            self.dirty = True
+            for band, buckets in zip(self._band_keys(signature), self._buckets):
+                buckets.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        with self._lock:
+            signature = self.signatures.pop(key, None)
+            if signature is None:
+                return False
+            self.dirty = True
+            for band, buckets in zip(self._band_keys(signature), self._buckets):
+                members = buckets.get(band)
+                if members is not None:
+                    members.discard(key)
+                    if not members:
+                        del buckets[band]
+            return True
+
+    def query(self, text=None, threshold=None, limit=10, signature=None, exclude=None):
+        """Indexed letters at least threshold similar to text, most similar first
+
+        threshold may be raised above the index's own, but candidates only come
+        from shared LSH buckets, so letters much below the index threshold are
+        unlikely to be found.
+        """
+        np = _timed_import("numpy")
+        if signature is None:
+            signature = self.signature(text or "")
+        threshold = self.threshold if threshold is None else threshold
+
+        with self._lock:
+            candidates = set()
+            for band, buckets in zip(self._band_keys(signature), self._buckets):
+                candidates.update(buckets.get(band, ()))
+            candidates.discard(exclude)
+            candidates = list(candidates)
+            if not candidates:
+                return []
+            stacked = np.stack([self.signatures[key] for key in candidates])
+
+        similarities = (stacked == signature).mean(axis=1)
+        matches = sorted(((float(s), key) for s, key in zip(similarities, candidates) if s >= threshold),
+                         key=lambda match: (-match[0], match[1]))
+        return [{"key": key, "similarity": round(s, 4)} for s, key in matches[:limit]]
+
+    def clusters(self, threshold=None, min_size=2):
+        """Group every indexed letter with the letters it is near-identical to
+
+        Pairs are only checked within shared buckets, then joined transitively.
+        Returns clusters (largest first) as {"size", "keys"}.
+        """
+        np = _timed_import("numpy")
+        threshold = self.threshold if threshold is None else threshold
+        parent = {}
+
+        def find(key):
+            while parent.get(key, key) != key:
+                parent[key] = parent.get(parent[key], parent[key])
+                key = parent[key]
+            return key
+
+        with self._lock, METRICS.stage("letter_clusters", letters=len(self.signatures)):
+            for buckets in self._buckets:
+                for members in buckets.values():
+                    if len(members) < 2:
+                        continue
+                    # Every pair in the bucket is a candidate; pairs already joined
+                    # (through this or an earlier bucket) are not compared again
+                    keys = sorted(members)
+                    for i, head in enumerate(keys[:-1]):
+                        rest = [k for k in keys[i + 1:] if find(k) != find(head)]
+                        if not rest:
+                            continue
+                        similarities = (np.stack([self.signatures[k] for k in rest])
+                                        == self.signatures[head]).mean(axis=1)
+                        for key, similarity in zip(rest, similarities):
+                            if similarity >= threshold:
+                                parent[find(key)] = find(head)
+
+            groups = {}
+            for key in parent:
+                groups.setdefault(find(key), []).append(key)
+        clusters = [sorted(set(keys) | {root}) for root, keys in groups.items()]
+        clusters = [c for c in clusters if len(c) >= min_size]
+        clusters.sort(key=lambda c: (-len(c), c[0]))
+        return [{"size": len(c), "keys": c} for c in clusters]
+
+    def sync(self, db, force=False):
+        """Index stored letters added or edited since the last sync
+
+        Deleted letters are not noticed; rebuild the index to drop them. Only
+        one thread syncs at a time; others skip the catch-up and read the
+        index as it is.
+        """
+        if not self._sync_lock.acquire(blocking=force):
+            return 0
+        try:
+            if not force and time.monotonic() - self._last_sync < SYNC_INTERVAL:
+                return 0
+            added = 0
+            newest = self.synced_at
+            for key, text, updated_at in iter_stored_letters(db, since=self.synced_at):
+                self.add(key, text)
+                added += 1
+                if updated_at is not None and (newest is None or updated_at > newest):
+                    newest = updated_at
+            self.synced_at = newest
+            self._last_sync = time.monotonic()
+            return added
+        finally:
+            self._sync_lock.release()
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def save(self, path=INDEX_PATH):
+        """Persist signatures (buckets are rebuilt on load)"""
+        np = _timed_import("numpy")
+        with self._lock:
+            keys = list(self.signatures)
+            matrix = (np.stack([self.signatures[k] for k in keys]) if keys
+                      else np.zeros((0, self.num_perm), dtype=np.uint64))
+            self.dirty = False
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "signatures.npy"), matrix)
+        manifest = {"format": INDEX_FORMAT, "threshold": self.threshold, "numPerm": self.num_perm,
+                    "shingleSize": self.shingle_size, "seed": self.seed, "keys": keys,
+                    "syncedAt": self.synced_at.isoformat() if self.synced_at else None}
+        tmp_path = os.path.join(path, f"manifest.json.tmp-{os.getpid()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(path, "manifest.json"))
+
+    def save_if_dirty(self, path=INDEX_PATH):
+        """save() when letters were added or removed since the last save"""
+        if not self.dirty or not path:
+            return False
+        try:
+            self.save(path)
+        except OSError as e:
+            self.dirty = True
+            print(f"Warning: could not save letter index to {path} ({e})", file=sys.stderr)
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        """A saved index, or None if there is none (or it was built with other settings)"""
+        import datetime
+        np = _timed_import("numpy")
+        manifest_path = os.path.join(path, "manifest.json") if path else None
+        if not manifest_path or not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            matrix = np.load(os.path.join(path, "signatures.npy"))
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable letter index at {path} ({e})", file=sys.stderr)
+            return None
+        if manifest.get("format") != INDEX_FORMAT or len(manifest["keys"]) != len(matrix):
+            return None
+
+        index = cls(manifest["threshold"], manifest["numPerm"], manifest["shingleSize"], manifest["seed"])
+        for key, signature in zip(manifest["keys"], matrix):
+            index.add_signature(key, signature)
+        if manifest.get("syncedAt"):
+            index.synced_at = datetime.datetime.fromisoformat(manifest["syncedAt"])
+        index.dirty = False
+        return index
+
+
+def iter_stored_letters(db, since=None, batch_size=500):
+    """(key, text, updatedAt) for every stored Lor and LORRequest letter, optionally only newer ones"""
+    for collection_name, field in STORED_LETTERS:
+        query = {field: {"$exists": True}}
+        if since is not None:
+            query["updatedAt"] = {"$gt": since}
+        cursor = db[collection_name].find(query, {field: 1, "updatedAt": 1}).batch_size(batch_size)
+        for document in cursor:
+            if isinstance(document.get(field), str):
+                yield f"{collection_name}:{document['_id']}", document[field], document.get("updatedAt")
+
+
+def iter_result_files(paths):
+    """(key, text) for generated letters in bulk or export JSON Lines output"""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    print(f"Warning: skipping unreadable line {line_number} of {path}", file=sys.stderr)
+                    continue
+                # bulk lines wrap the generate result; export lines are the result itself
+                result = entry.get("result", entry)
+                if "generatedContent" not in result:
+                    continue
+                key = result.get("studentId") or entry.get("job", {}).get("studentId") or line_number
+                yield f"{os.path.basename(path)}:{key}", result["generatedContent"]
+
+
+def _shingles(text, size):
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _lsh_params(threshold, num_perm):
+    """(bands, rows) minimizing the false positive plus false negative area
+    of the LSH S-curve around threshold"""
+    steps = 200
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            error = 0.0
+            for step in range(steps):
+                s = (step + 0.5) / steps
+                collide = 1 - (1 - s ** rows) ** bands
+                error += collide if s < threshold else 1 - collide
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+
+def dedupe_main(argv):
+    import argparse
+    from lor_recommendation_ai import get_db
+
+    parser = argparse.ArgumentParser(prog="lor_recommendation_ai.py dedupe",
+                                     description="Cluster near-duplicate letters (stored Lor/LORRequest letters and "
+                                                 "bulk or export output files)")
+    parser.add_argument("inputs", nargs="*", help="bulk/export JSON Lines files to include")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD, help="Minimum estimated similarity")
+    parser.add_argument("--min-size", type=int, default=2, help="Smallest cluster to report")
+    parser.add_argument("--no-stored", action="store_true", help="Skip the letters stored in MongoDB")
+    parser.add_argument("--save", action="store_true", help=f"Save the index for the server ({INDEX_PATH})")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    index = LetterIndex(threshold=args.threshold)
+    if not args.no_stored:
+        index.sync(get_db(), force=True)
+    index.add_many(iter_result_files(args.inputs))
+    clusters = index.clusters(min_size=args.min_size)
+    if args.save and INDEX_PATH:
+        index.save()
+
+    print(json.dumps({
+        "letters": len(index),
+        "bands": index.bands,
+        "rows": index.rows,
+        "duplicateLetters": sum(c["size"] for c in clusters),
+        "clusters": clusters,
+        "seconds": round(time.perf_counter() - started, 3),
+    }, indent=2))
@@ -0,0 +1,101 @@
+import asyncio
+
+from data_access import INTERNSHIP_PROJECTION, PLACEMENT_PROJECTION, STUDENT_PROJECTION, student_filter
+from lor_recommendation_ai import MONGO_URI, LORRecommendationAI, _timed_import, _to_object_id
+
+
+class AsyncLORRecommendationAI:
+    """asyncio variant of analyze_student, find_best_template and generate_lor_content
+
+    Student, internship, placement (and template) lookups go through the motor
+    driver and run concurrently with asyncio.gather, so one event loop can keep
+    many requests in flight. Scoring, template matching and rendering reuse the
+    synchronous recommender's in-memory logic.
+
+        ai = AsyncLORRecommendationAI()
+        letters = await asyncio.gather(*(ai.generate_lor_content(i, purpose="Graduate School") for i in ids))
+    """
+
+    def __init__(self, recommender=None, db=None):
+        if db is None:
+            AsyncIOMotorClient = _timed_import("motor.motor_asyncio").AsyncIOMotorClient
+            db = AsyncIOMotorClient(MONGO_URI).get_database()
+        self.recommender = recommender or LORRecommendationAI()
+
+        self.template_collection = db["lortemplates"]
+        self.student_collection = db["students"]
+        self.internship_collection = db["internships"]
+        self.placement_collection = db["placements"]
+
+    async def _fetch_student(self, student_id, student_id_obj, template_id_obj=None):
+        """The student's documents (and optionally a template), fetched concurrently, and the query count"""
+        lookups = [
+            self.student_collection.find_one({"_id": student_id_obj}, STUDENT_PROJECTION),
+            self.internship_collection.find(student_filter(student_id), INTERNSHIP_PROJECTION).to_list(None),
+            self.placement_collection.find(student_filter(student_id), PLACEMENT_PROJECTION).to_list(None),
+        ]
+        if template_id_obj is not None:
+            lookups.append(self.template_collection.find_one({"_id": template_id_obj}))
+
+        results = await asyncio.gather(*lookups)
+        round_trips = len(results)
+        if template_id_obj is None:
+            results.append(None)
+        return results, round_trips
+
+    async def analyze_student(self, student_id):
+        """Analyze student data and determine strengths"""
+        student_id_obj = _to_object_id(student_id)
+        if student_id_obj is None:
+            return {"error": "Invalid student ID format"}
+
+        (student, internships, placements, _), round_trips = await self._fetch_student(student_id, student_id_obj)
+        if not student:
+            return {"error": "Student not found"}
+
+        analysis = self.recommender._analyze_documents(student, internships, placements)
+        return dict(analysis, dbRoundTrips=round_trips)
+
+    async def find_best_template(self, student_id, purpose, top_k=1, filters=None, match_mode=None):
+        """Find the most appropriate LOR template based on student profile and purpose"""
+        student_analysis = await self.analyze_student(student_id)
+        if "error" in student_analysis:
+            return {"error": student_analysis["error"]}
+        student_analysis.pop("dbRoundTrips")
+        return await self._match_template(student_analysis, purpose, top_k, filters, match_mode)
+
+    async def _match_template(self, student_analysis, purpose, top_k=1, filters=None, match_mode=None):
+        # Template index polling uses the blocking driver; keep it off the event loop
+        return await asyncio.to_thread(self.recommender._match_template, student_analysis, purpose,
+                                       top_k, filters, match_mode)
+
+    async def generate_lor_content(self, student_id, template_id=None, purpose="", university="", program="",
+                                   filters=None):
+        """Generate tailored LOR content based on student data and selected template"""
+        student_id_obj = _to_object_id(student_id)
+        if student_id_obj is None:
+            return {"error": "Invalid student ID format"}
+
+        template_id_obj = None
+        if template_id:
+            template_id_obj = _to_object_id(template_id)
+            if template_id_obj is None:
+                return {"error": "Invalid template ID format"}
+
+        (student, internships, placements, template), round_trips = await self._fetch_student(
+            student_id, student_id_obj, template_id_obj)
+        if not student:
+            return {"error": "Student not found"}
+
+        analysis = self.recommender._analyze_documents(student, internships, placements)
+        if template_id_obj is None:
+            template_result = await self._match_template(analysis, purpose, filters=filters)
+            if "error" in template_result:
+                return template_result
+            template = template_result["template"]
+        elif not template:
+            return {"error": "Template not found"}
+
+        result = self.recommender._render_lor(template, student, internships, analysis["strengths"],
+                                              purpose, university, program, analysis.get("insights"))
+        return dict(result, dbRoundTrips=round_trips)
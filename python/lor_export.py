@@ -0,0 +1,190 @@
+import datetime
+import io
+import json
+import re
+import sys
+import time
+import zipfile
+from itertools import islice
+
+from lor_recommendation_ai import LORRecommendationAI, _timed_import, _to_object_id, to_json
+
+EXPORT_FORMATS = ("jsonl", "zip", "docx", "lor")
+DEFAULT_CHUNK_SIZE = 100
+PROGRESS_INTERVAL = 5.0  # seconds
+
+
+def iter_student_ids(recommender, query=None, batch_size=DEFAULT_CHUNK_SIZE):
+    """Stream student ids matching query straight off a Mongo cursor"""
+    cursor = recommender.student_collection.find(query or {}, {"_id": 1}).batch_size(batch_size)
+    for student in cursor:
+        yield str(student["_id"])
+
+
+def generate_letters(recommender, student_ids, purpose="", university="", program="", chunk_size=DEFAULT_CHUNK_SIZE,
+                     polish=None):
+    """Yield (student_id, result) pairs, generating one chunk of students at a time
+
+    Only the current chunk's documents and letters are ever held in memory.
+    """
+    student_ids = iter(student_ids)
+    while True:
+        chunk = list(islice(student_ids, chunk_size))
+        if not chunk:
+            return
+        results = recommender.generate_lor_batch(
+            [{"studentId": i, "purpose": purpose, "university": university, "program": program} for i in chunk])
+        if polish:
+            from neural_polish import polish_results
+            results = polish_results(results, polish)
+        yield from zip(chunk, results)
+
+
+def with_progress(letters, stream=None, interval=PROGRESS_INTERVAL):
+    """Pass letters through, printing progress and throughput as JSON lines"""
+    stream = stream or sys.stderr
+    started = last_report = time.perf_counter()
+    processed = failed = 0
+
+    def report(done=False):
+        elapsed = time.perf_counter() - started
+        print(json.dumps({"progress": {"processed": processed, "failed": failed, "seconds": round(elapsed, 1),
+                                       "perSecond": round(processed / elapsed, 2) if elapsed else 0.0,
+                                       "done": done}}), file=stream, flush=True)
+
+    for student_id, result in letters:
+        processed += 1
+        failed += "error" in result
+        yield student_id, result
+        if time.perf_counter() - last_report >= interval:
+            last_report = time.perf_counter()
+            report()
+    report(done=True)
+
+
+def write_jsonl(letters, path):
+    written = 0
+    with open(path, "w", encoding="utf-8") as out:
+        for student_id, result in letters:
+            out.write(to_json(dict(result, studentId=student_id)) + "\n")
+            written += 1
+    return {"written": written}
+
+
+def write_zip(letters, path, as_docx=False):
+    """One .txt (or .docx) file per letter; failed students are skipped"""
+    written = skipped = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for student_id, result in letters:
+            if "error" in result:
+                skipped += 1
+                continue
+            name = f"{student_id}-{_slug(result.get('studentName', ''))}"
+            if as_docx:
+                archive.writestr(f"{name}.docx", _docx_bytes(result["generatedContent"]))
+            else:
+                archive.writestr(f"{name}.txt", result["generatedContent"])
+            written += 1
+    return {"written": written, "skipped": skipped}
+
+
+def write_lor_collection(letters, collection, faculty_id, batch_size=DEFAULT_CHUNK_SIZE):
+    """Upsert a pending Lor document per student with unordered bulk writes
+
+    Re-running an export updates the same pending letters instead of adding
+    duplicates.
+    """
+    UpdateOne = _timed_import("pymongo").UpdateOne
+    faculty = _to_object_id(faculty_id)
+    if faculty is None:
+        raise ValueError("faculty must be a valid user id")
+
+    counts = {"written": 0, "skipped": 0}
+    operations = []
+
+    def flush():
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            counts["written"] += result.upserted_count + result.modified_count
+            operations.clear()
+
+    for student_id, result in letters:
+        if "error" in result:
+            counts["skipped"] += 1
+            continue
+        now = datetime.datetime.utcnow()
+        operations.append(UpdateOne(
+            {"student": _to_object_id(student_id), "faculty": faculty, "status": "pending"},
+            {"$set": {"lorDocument": result["generatedContent"], "updatedAt": now},
+             "$setOnInsert": {"issuedAt": now}},
+            upsert=True))
+        if len(operations) >= batch_size:
+            flush()
+    flush()
+    return counts
+
+
+def export(recommender, fmt, output=None, query=None, purpose="", university="", program="", faculty=None,
+           chunk_size=DEFAULT_CHUNK_SIZE, polish=None, progress=True):
+    """Stream letters for every student matching query into one sink"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+
+    letters = generate_letters(recommender, iter_student_ids(recommender, query, chunk_size),
+                               purpose, university, program, chunk_size, polish)
+    if progress:
+        letters = with_progress(letters)
+
+    started = time.perf_counter()
+    if fmt == "jsonl":
+        summary = write_jsonl(letters, output)
+    elif fmt in ("zip", "docx"):
+        summary = write_zip(letters, output, as_docx=fmt == "docx")
+    else:
+        # Mongoose registers the Lor model as the "lors" collection
+        lors = recommender.student_collection.database["lors"]
+        summary = write_lor_collection(letters, lors, faculty, chunk_size)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def export_main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="lor_recommendation_ai.py export",
+                                     description="Generate letters for a cohort and stream them to a file or the Lor collection")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl")
+    parser.add_argument("--output", help="Output file (jsonl, zip and docx formats)")
+    parser.add_argument("--query", type=json.loads, help='Student filter as JSON, e.g. \'{"semester": 8}\'')
+    parser.add_argument("--purpose", default="Graduate School")
+    parser.add_argument("--university", default="")
+    parser.add_argument("--program", default="")
+    parser.add_argument("--faculty", help="Issuing faculty user id (lor format)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Students generated per batch")
+    parser.add_argument("--polish", choices=("summarize", "expand"), help="Rewrite letters with a local neural model")
+    args = parser.parse_args(argv)
+
+    if args.format == "lor" and not args.faculty:
+        parser.error("--faculty is required for the lor format")
+    if args.format != "lor" and not args.output:
+        parser.error("--output is required for file formats")
+
+    recommender = LORRecommendationAI()
+    recommender.warm()
+    summary = export(recommender, args.format, args.output, args.query, args.purpose, args.university, args.program,
+                     args.faculty, args.chunk_size, args.polish)
+    print(json.dumps(summary))
+
+
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-")[:60] or "letter"
+
+
+def _docx_bytes(content):
+    Document = _timed_import("docx").Document
+    document = Document()
+    for paragraph in content.split("\n\n"):
+        document.add_paragraph(paragraph.strip())
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
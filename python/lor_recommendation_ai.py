@@ -1,79 +1,418 @@
-import pandas as pd
-import numpy as np
-import spacy
+import atexit
+import hashlib
+import importlib
 import json
 import os
 import sys
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from pymongo import MongoClient
-from bson import ObjectId
-from dotenv import load_dotenv
+import threading
+import time
+
+_PROCESS_START = time.perf_counter()
+
+# Seconds spent importing/loading each dependency, for the startup report
+IMPORT_TIMINGS = {}
+
+def _timed_import(name):
+    """Import a module on first use and record how long the import took"""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMINGS[name] = time.perf_counter() - start
+    return module
+
+ObjectId = _timed_import("bson").ObjectId
+load_dotenv = _timed_import("dotenv").load_dotenv
 
 # Load environment variables from parent directory
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 load_dotenv(dotenv_path)
 
-# Connect to MongoDB (using same connection as Node.js)
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/lor_system")
-client = MongoClient(MONGO_URI)
-db = client.get_database()  # This will use the same database as your Node.js app
 
-# Initialize NLP components
-try:
-    nlp = spacy.load("en_core_web_md")
-except:
-    print("Error: Spacy model 'en_core_web_md' not found. Run: python -m spacy download en_core_web_md", file=sys.stderr)
-    sys.exit(1)
+# Read from a memory-mapped snapshot (see snapshot.py) instead of live Mongo
+SNAPSHOT_DIR = os.getenv("LOR_SNAPSHOT_DIR")
+
+# Per-stage counters and histograms (see metrics.py); stdlib only, so cheap to import
+from metrics import METRICS, trace
+
+# Derived data (template vectors, index artifacts) lives here between runs
+CACHE_DIR = os.getenv("LOR_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+
+# Template matching: "tfidf" (default), "semantic" (spaCy vectors) or "hybrid" (both)
+MATCH_MODES = ("tfidf", "semantic", "hybrid")
+DEFAULT_MATCH_MODE = os.getenv("LOR_MATCH_MODE", "tfidf")
+DEFAULT_SEMANTIC_WEIGHT = float(os.getenv("LOR_SEMANTIC_WEIGHT", "0.5"))
+
+# Run achievements/positions/skills through spaCy (text_understanding.py) during analysis
+DEFAULT_TEXT_NLP = os.getenv("LOR_TEXT_NLP", "0") not in ("0", "false", "no")
+
+# Heavy dependencies are created on first use so that cheap code paths
+# (get_templates, analyze_student) never pay for them
+_lazy_lock = threading.Lock()
+_db = None
+_nlp = None
+
+def get_db():
+    """Connect to MongoDB (using same connection as Node.js) on first use"""
+    global _db
+    with _lazy_lock:
+        if _db is None and SNAPSHOT_DIR:
+            from snapshot import SnapshotDatabase
+            _db = SnapshotDatabase(SNAPSHOT_DIR)
+        if _db is None:
+            MongoClient = _timed_import("pymongo").MongoClient
+            client = MongoClient(MONGO_URI)
+            _db = client.get_database()  # This will use the same database as your Node.js app
+    return _db
+
+def get_nlp():
+    """Load the spaCy model on first use"""
+    global _nlp
+    with _lazy_lock:
+        if _nlp is None:
+            spacy = _timed_import("spacy")
+            start = time.perf_counter()
+            try:
+                _nlp = spacy.load("en_core_web_md")
+            except OSError:
+                raise RuntimeError("Spacy model 'en_core_web_md' not found. Run: python -m spacy download en_core_web_md")
+            IMPORT_TIMINGS["spacy.load(en_core_web_md)"] = time.perf_counter() - start
+    return _nlp
+
+def startup_report():
+    """Per-import timings plus total time since the module started loading"""
+    return {
+        "imports": {name: round(seconds, 4) for name, seconds in IMPORT_TIMINGS.items()},
+        "importTotal": round(sum(IMPORT_TIMINGS.values()), 4),
+        "elapsed": round(time.perf_counter() - _PROCESS_START, 4)
+    }
+
+def _to_object_id(value):
+    """Convert a string ID to ObjectId; None if it isn't a valid id"""
+    if isinstance(value, str):
+        try:
+            return ObjectId(value)
+        except:
+            return None
+    return value
+
+def _version_hash(*groups):
+    """Stable hash of the (_id, updatedAt) pairs of some documents"""
+    parts = []
+    for documents in groups:
+        versions = sorted((str(d["_id"]), str(d.get("updatedAt"))) for d in documents if d)
+        parts.append(repr(versions))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+def _group_by_student(documents):
+    """Group related documents by their studentId (as a string)"""
+    grouped = {}
+    for doc in documents:
+        grouped.setdefault(str(doc.get("studentId")), []).append(doc)
+    return grouped
+
+class RequestContext:
+    """Student documents for one request, fetched at most once and shared by
+    analysis, template matching and rendering.
+    
+    round_trips counts the Mongo queries issued on behalf of the request
+    (template index polling is shared across requests and not counted).
+    """
+    def __init__(self, recommender, student_id):
+        self.recommender = recommender
+        self.student_id = student_id
+        self.student_id_obj = _to_object_id(student_id)
+        self.round_trips = 0
+        self._cache = {}
+    
+    def find_one(self, collection, query, projection=None):
+        self.round_trips += 1
+        with METRICS.stage("mongo_fetch", collection=collection.name):
+            return collection.find_one(query, projection)
+    
+    def find(self, collection, query, projection=None):
+        self.round_trips += 1
+        with METRICS.stage("mongo_fetch", collection=collection.name):
+            return list(collection.find(query, projection))
+    
+    def _fetch_once(self, key, fetch):
+        if key not in self._cache:
+            self._cache[key] = fetch()
+        return self._cache[key]
+    
+    @property
+    def student(self):
+        from data_access import STUDENT_PROJECTION
+        if self.student_id_obj is None:
+            return None
+        return self._fetch_once("student", lambda: self.find_one(
+            self.recommender.student_collection, {"_id": self.student_id_obj}, STUDENT_PROJECTION))
+    
+    @property
+    def internships(self):
+        from data_access import INTERNSHIP_PROJECTION, student_filter
+        return self._fetch_once("internships", lambda: self.find(
+            self.recommender.internship_collection, student_filter(self.student_id), INTERNSHIP_PROJECTION))
+    
+    @property
+    def placements(self):
+        from data_access import PLACEMENT_PROJECTION, student_filter
+        return self._fetch_once("placements", lambda: self.find(
+            self.recommender.placement_collection, student_filter(self.student_id), PLACEMENT_PROJECTION))
+    
+    def analysis(self):
+        """analyze_student's result for this student, computed once"""
+        def analyze():
+            if self.student_id_obj is None:
+                return {"error": "Invalid student ID format"}
+            if not self.student:
+                return {"error": "Student not found"}
+            return self.recommender._analyze_documents(self.student, self.internships, self.placements)
+        return self._fetch_once("analysis", analyze)
+    
+    def fingerprint(self):
+        """Version stamp of the student's documents, from the updatedAt of the fetched documents
+        
+        Any edit to the student or one of their internships/placements (or
+        adding/removing one) changes the fingerprint. It costs no queries of
+        its own: the documents are the ones analysis and rendering use.
+        """
+        return self._fetch_once("fingerprint", lambda: _version_hash(
+            [self.student], self.internships, self.placements))
 
 class LORRecommendationAI:
-    def __init__(self):
+    def __init__(self, db=None, match_mode=DEFAULT_MATCH_MODE, semantic_weight=DEFAULT_SEMANTIC_WEIGHT,
+                 result_cache=None, text_nlp=DEFAULT_TEXT_NLP):
+        if db is None:
+            db = get_db()
+        # Optional result_cache.ResultCache in front of analyze/generate
+        self.result_cache = result_cache
+        # Optional analysis_view.AnalysisView that analyze reads from first
+        self.analysis_view = None
+        # Set when change streams invalidate the result cache, so cache keys
+        # skip the per-request fingerprint (entries still expire after the TTL)
+        self.change_tracking = False
+        if match_mode not in MATCH_MODES:
+            raise ValueError(f"match_mode must be one of {', '.join(MATCH_MODES)}")
+        self.match_mode = match_mode
+        self.semantic_weight = semantic_weight
+        self.text_nlp = text_nlp
+        self._text_understanding = None
+        self._letter_index = None
         self.template_collection = db["lortemplates"]
         self.student_collection = db["students"]
         self.internship_collection = db["internships"]
         self.placement_collection = db["placements"]
         
-        # Load or create similarity model for template matching
-        self.vectorizer = TfidfVectorizer(stop_words='english')
-        self._load_templates()
+        # Similarity model for template matching is built on first use and
+        # kept in step with the lortemplates collection afterwards
+        from template_index import TemplateIndex
+        from template_renderer import TemplateRenderer
+        self.template_index = TemplateIndex(self.template_collection)
+        self.renderer = TemplateRenderer()
+        self._embeddings = None
+        self.index_report = None
+        
+        # Field and leadership keyword tables, compiled once per process
+        from keyword_matcher import get_keyword_tables
+        self.keywords = get_keyword_tables()
+    
+    @property
+    def templates(self):
+        return self.template_index.templates
+    
+    def warm(self):
+        """Eagerly load everything a long-lived process will need"""
+        if self.index_report is None:
+            self.index_report = self.ensure_indexes()
+        self.template_index.ensure_loaded()
+        if self.text_nlp:
+            get_nlp()
+        if self.match_mode != "tfidf":
+            self.embeddings.matrix(self.template_index.templates)
+    
+    def ensure_indexes(self, create=None):
+        """Verify (and by default create) the indexes the access paths rely on"""
+        from data_access import CREATE_INDEXES, ensure_indexes
+        return ensure_indexes(self.student_collection.database, CREATE_INDEXES if create is None else create)
+    
+    def explain(self, student_id=None):
+        """Index report plus explain() plans for each query issued per request"""
+        from data_access import explain_access_paths
+        return {"indexes": self.ensure_indexes(create=False), "explain": explain_access_paths(self, student_id)}
+    
+    @property
+    def text_understanding(self):
+        """spaCy roles/organizations/verbs extractor, only loaded when text_nlp is on"""
+        if self._text_understanding is None:
+            from text_understanding import TextUnderstanding
+            self._text_understanding = TextUnderstanding(self.keywords)
+        return self._text_understanding
+    
+    def _insights_many(self, pairs):
+        """Text insights for (student, internships) pairs in one batch, or Nones when text_nlp is off"""
+        if not self.text_nlp or not pairs:
+            return [None] * len(pairs)
+        return self.text_understanding.insights_many(pairs)
+    
+    @property
+    def letter_index(self):
+        """MinHash/LSH index of stored letters, loaded from disk if saved and caught up on use"""
+        if self._letter_index is None:
+            from letter_similarity import LetterIndex
+            self._letter_index = LetterIndex.load() or LetterIndex()
+        self._letter_index.sync(self.student_collection.database)
+        return self._letter_index
+    
+    def save_letter_index(self):
+        """Persist the letter index if letters were added since it was last saved"""
+        if self._letter_index is not None:
+            self._letter_index.save_if_dirty()
+    
+    @property
+    def embeddings(self):
+        """spaCy template vectors, only loaded for semantic/hybrid matching"""
+        if self._embeddings is None:
+            from template_embeddings import TemplateEmbeddings
+            self._embeddings = TemplateEmbeddings()
+        return self._embeddings
     
     def _load_templates(self):
         """Load all LOR templates and prepare for matching"""
-        templates = list(self.template_collection.find())
+        self.template_index.load()
+    
+    def analyze_student(self, student_id, context=None):
+        """Analyze student data and determine strengths"""
+        if context is None:
+            context = RequestContext(self, student_id)
         
-        if not templates:
-            print("Warning: No templates found in database", file=sys.stderr)
-            self.templates = []
-            self.template_vectors = None
-            return
-            
-        self.templates = templates
+        # View entries are served as stored; the watcher or poller keeps them
+        # within the view's staleness bound (see AnalysisView)
+        if self.analysis_view is not None and context.student_id_obj is not None:
+            stored = self.analysis_view.get(student_id)
+            context.round_trips += 1
+            if stored is not None:
+                return dict(stored, dbRoundTrips=context.round_trips)
         
-        # Create content vector for similarity matching
-        template_texts = [str(t.get("content", "")) for t in templates]
-        self.template_vectors = self.vectorizer.fit_transform(template_texts)
+        cache_key = None
+        if self.result_cache is not None and context.student_id_obj is not None:
+            cache_key = ("analyze", str(student_id), self._cache_version(context))
+            cached = self.result_cache.get(cache_key, tag=str(student_id))
+            if cached is not None:
+                return dict(cached, dbRoundTrips=context.round_trips)
+        
+        analysis = context.analysis()
+        if "error" in analysis:
+            return analysis
+        if cache_key is not None:
+            self.result_cache.put(cache_key, analysis, tag=str(student_id))
+        if self.analysis_view is not None:
+            self.analysis_view.store(student_id, analysis, context.fingerprint())
+            context.round_trips += 1
+        return dict(analysis, dbRoundTrips=context.round_trips)
     
-    def analyze_student(self, student_id):
-        """Analyze student data and determine strengths"""
-        # Convert string ID to ObjectId if needed
-        if isinstance(student_id, str):
-            try:
-                student_id_obj = ObjectId(student_id)
-            except:
-                return {"error": "Invalid student ID format"}
+    def _cache_version(self, context):
+        """The fingerprint part of a result-cache key
+        
+        With change tracking on, change streams drop a student's entries when
+        their documents change, so a cache hit needs no query at all.
+        """
+        return None if self.change_tracking else context.fingerprint()
+    
+    def analyze_students(self, student_ids, vectorized=False):
+        """Analyze a cohort of students with one query per collection
+        
+        Returns one analysis per id, in input order, shaped like analyze_student
+        (including error entries for bad or unknown ids) but without
+        dbRoundTrips: the whole cohort shares one query per collection.
+        With vectorized=True the strength rules run as column operations
+        over the whole cohort (see cohort_scoring.CohortScorer).
+        """
+        student_ids = list(student_ids)
+        object_ids = [_to_object_id(i) for i in student_ids]
+        students, internships, placements = self._fetch_cohort(student_ids, object_ids)
+        
+        results = []
+        found = []
+        for student_id, student_id_obj in zip(student_ids, object_ids):
+            if student_id_obj is None:
+                results.append({"error": "Invalid student ID format"})
+                continue
+            student = students.get(student_id_obj)
+            if not student:
+                results.append({"error": "Student not found"})
+                continue
+            results.append(None)
+            found.append((len(results) - 1, student,
+                          internships.get(str(student_id), []),
+                          placements.get(str(student_id), [])))
+        
+        # One batched spaCy pass for the whole cohort (when enabled)
+        insights = self._insights_many([(student, i) for _, student, i, _ in found])
+        
+        if vectorized and found:
+            scorer = self._cohort_scorer()
+            cohort_students = [student for _, student, _, _ in found]
+            frame = scorer.score(cohort_students,
+                                 [i for _, _, i, _ in found],
+                                 [p for _, _, _, p in found],
+                                 leadership=[self._insight_leadership(i) for i in insights])
+            analyses = scorer.analyses(frame, cohort_students, self, insights)
         else:
-            student_id_obj = student_id
+            analyses = [self._analyze_documents(student, i, p, text_insights)
+                        for (_, student, i, p), text_insights in zip(found, insights)]
         
-        # Get student data
-        student = self.student_collection.find_one({"_id": student_id_obj})
-        if not student:
-            return {"error": "Student not found"}
+        for (position, _, _, _), analysis in zip(found, analyses):
+            results[position] = analysis
+        return results
+    
+    def analyze_cohort(self, student_ids):
+        """Score a cohort into a pandas DataFrame for ranking and filtering
         
-        # Get student internships
-        internships = list(self.internship_collection.find({"studentId": student_id}))
+        One row per student that was found, with strength flags, per-field
+        scores and primaryField as columns.
+        """
+        student_ids = list(student_ids)
+        object_ids = [_to_object_id(i) for i in student_ids]
+        students, internships, placements = self._fetch_cohort(student_ids, object_ids)
         
-        # Get student placements
-        placements = list(self.placement_collection.find({"studentId": student_id}))
+        rows = [(i, students[o]) for i, o in zip(student_ids, object_ids) if o is not None and o in students]
+        return self._cohort_scorer().score([student for _, student in rows],
+                                           [internships.get(str(i), []) for i, _ in rows],
+                                           [placements.get(str(i), []) for i, _ in rows])
+    
+    def _cohort_scorer(self):
+        from cohort_scoring import CohortScorer
+        return CohortScorer(self.keywords)
+    
+    @METRICS.timed("mongo_fetch")
+    def _fetch_cohort(self, student_ids, object_ids):
+        """Fetch students, internships and placements for many ids using $in queries"""
+        from data_access import INTERNSHIP_PROJECTION, PLACEMENT_PROJECTION, STUDENT_PROJECTION, students_filter
+        
+        valid = [(i, o) for i, o in zip(student_ids, object_ids) if o is not None]
+        if not valid:
+            return {}, {}, {}
+        
+        students = {s["_id"]: s for s in self.student_collection.find(
+            {"_id": {"$in": [o for _, o in valid]}}, STUDENT_PROJECTION)}
+        
+        # Related documents are matched on studentId exactly as analyze_student does
+        related = students_filter(i for i, _ in valid)
+        internships = _group_by_student(self.internship_collection.find(related, INTERNSHIP_PROJECTION))
+        placements = _group_by_student(self.placement_collection.find(related, PLACEMENT_PROJECTION))
+        return students, internships, placements
+    
+    @METRICS.timed("analysis")
+    def _analyze_documents(self, student, internships, placements, insights=None):
+        """Determine strengths from already-fetched student documents
+        
+        insights are the student's text_understanding results; they are
+        computed here when text_nlp is on and the caller has none.
+        """
+        if insights is None and self.text_nlp:
+            insights = self.text_understanding.student_insights(student, internships)
         
         # Analyze student data to determine strengths
         strengths = []
@@ -103,58 +442,54 @@ class LORRecommendationAI:
         # Leadership/soft skills (analyze achievements)
         if "achievements" in student and isinstance(student["achievements"], list) and student["achievements"]:
             achievement_text = " ".join(student["achievements"])
-            leadership_keywords = ["lead", "organiz", "head", "volunteer", "president", 
-                                  "chair", "captain", "manage", "direct"]
-                                  
-            if any(keyword in achievement_text.lower() for keyword in leadership_keywords):
+            
+            if self.keywords.leadership.any(achievement_text) or self._insight_leadership(insights):
                 strengths.append("leadership")
         
         # Determine primary field of study/interest
         primary_field = self._determine_primary_field(student, internships)
         
-        return {
+        analysis = {
             "studentName": student.get("name", ""),
             "strengths": strengths,
             "primaryField": primary_field,
             "recommendations": self._generate_recommendations(strengths, student)
         }
+        if insights is not None:
+            analysis["insights"] = insights
+        return analysis
+    
+    def _insight_leadership(self, insights):
+        """Leadership from lemmatised action verbs ("Led", "Organised") or leadership roles"""
+        if not insights:
+            return False
+        if self.keywords.leadership.any(" ".join(insights["actionVerbs"])):
+            return True
+        return bool(self._leadership_roles(insights))
+    
+    def _leadership_roles(self, insights):
+        roles = self.keywords.roles
+        if not insights or roles is None:
+            return []
+        return [role for role in insights["roles"] if roles.score(role).get("leadership", 0) > 0]
     
     def _determine_primary_field(self, student, internships):
         """Determine the student's primary field based on skills and internships"""
-        # Define field keywords
-        field_keywords = {
-            "web development": ["html", "css", "javascript", "react", "angular", "node", "web"],
-            "data science": ["python", "r", "statistics", "machine learning", "data", "analysis"],
-            "software engineering": ["java", "c++", "software", "development", "oop"],
-            "ai/ml": ["machine learning", "ai", "artificial intelligence", "deep learning", "neural"],
-            "cybersecurity": ["security", "cyber", "encryption", "network security"],
-            "mobile development": ["android", "ios", "swift", "kotlin", "mobile"],
-            "cloud computing": ["aws", "azure", "cloud", "docker", "kubernetes"]
-        }
-        
-        # Count matches for each field
-        field_scores = {field: 0 for field in field_keywords}
+        # Count matches for each field (keyword tables live in data/keywords.json)
+        field_matcher = self.keywords.fields
+        field_scores = {field: 0 for field in field_matcher.groups}
         
         # Check skills
         if "skills" in student and isinstance(student["skills"], list):
-            skills_text = " ".join(student["skills"]).lower()
-            
-            for field, keywords in field_keywords.items():
-                for keyword in keywords:
-                    if keyword in skills_text:
-                        field_scores[field] += 1
+            skills_text = " ".join(student["skills"])
+            field_matcher.score(skills_text, scores=field_scores)
         
         # Check internships
         if internships:
             for internship in internships:
-                position = internship.get("position", "").lower()
-                company = internship.get("company", "").lower()
-                internship_text = f"{position} {company}"
-                
-                for field, keywords in field_keywords.items():
-                    for keyword in keywords:
-                        if keyword in internship_text:
-                            field_scores[field] += 2  # Weight internships more heavily
+                internship_text = f"{internship.get('position', '')} {internship.get('company', '')}"
+                # Weight internships more heavily
+                field_matcher.score(internship_text, weight=2, scores=field_scores)
         
         # Get field with highest score
         max_score = max(field_scores.values()) if field_scores else 0
@@ -221,14 +556,29 @@ class LORRecommendationAI:
             
         return recommendations
     
-    def find_best_template(self, student_id, purpose):
-        """Find the most appropriate LOR template based on student profile and purpose"""
-        student_analysis = self.analyze_student(student_id)
+    def find_best_template(self, student_id, purpose, context=None, top_k=1, filters=None, match_mode=None):
+        """Find the most appropriate LOR template based on student profile and purpose
+        
+        With top_k > 1 the next best templates are returned as alternatives.
+        filters restricts matching to templates whose fields have the given
+        values, e.g. {"purpose": "Graduate School"}. match_mode overrides the
+        recommender's default ("tfidf", "semantic" or "hybrid").
+        """
+        if context is None:
+            context = RequestContext(self, student_id)
+        student_analysis = context.analysis()
         
         if "error" in student_analysis:
             return {"error": student_analysis["error"]}
-            
-        if not self.templates:
+        
+        return self._match_template(student_analysis, purpose, top_k, filters, match_mode)
+    
+    @METRICS.timed("template_match")
+    def _match_template(self, student_analysis, purpose, top_k=1, filters=None, match_mode=None):
+        """Pick the template closest to an existing student analysis"""
+        # Pick up templates added, edited or deleted since the last poll
+        self.template_index.refresh()
+        if not self.template_index.templates:
             return {"error": "No templates available"}
             
         # Create a query document combining student strengths and purpose
@@ -237,62 +587,166 @@ class LORRecommendationAI:
         # Add strengths to query
         for strength in student_analysis["strengths"]:
             query_text += f" {strength}"
-            
-        # Vectorize the query
-        query_vector = self.vectorizer.transform([query_text])
-        
-        # Calculate similarity with all templates
-        similarities = cosine_similarity(query_vector, self.template_vectors).flatten()
         
-        # Get the best matching template
-        best_match_idx = similarities.argmax()
-        best_template = self.templates[best_match_idx]
+        match_mode = match_mode or self.match_mode
+        if match_mode == "tfidf":
+            # Score only templates sharing terms with the query (and passing the filters)
+            matches = self.template_index.search(query_text, k=max(top_k, 1), filters=filters)
+        else:
+            matches = self._semantic_search(query_text, max(top_k, 1), filters, match_mode)
+        if not matches:
+            return {"error": "No templates match the given filters"}
         
-        return {
+        best_template, best_score = matches[0]
+        result = {
             "template": best_template,
-            "similarity_score": float(similarities[best_match_idx]),
+            "similarity_score": best_score,
             "student_analysis": student_analysis
         }
+        if top_k > 1:
+            result["alternatives"] = [
+                {"template": template, "similarity_score": score}
+                for template, score in matches[1:]
+            ]
+        return result
     
-    def generate_lor_content(self, student_id, template_id=None, purpose="", university="", program=""):
+    def _semantic_search(self, query_text, k, filters, match_mode):
+        """Rank templates by spaCy vector similarity, optionally blended with TF-IDF"""
+        np = _timed_import("numpy")
+        
+        templates, tfidf_scores, allowed = self.template_index.similarities(query_text, filters)
+        if not templates:
+            return []
+        
+        with METRICS.stage("vectorize", model="spacy"):
+            template_vectors = self.embeddings.matrix(templates)
+            query_vector = self.embeddings.embed(query_text)
+        # One matrix-vector product against the cached, normalised template vectors
+        with METRICS.stage("similarity"):
+            scores = template_vectors @ query_vector
+        if match_mode == "hybrid":
+            scores = self.semantic_weight * scores + (1 - self.semantic_weight) * tfidf_scores
+        
+        rows = np.arange(len(templates)) if allowed is None else allowed
+        best = rows[np.lexsort((rows, -scores[rows]))[:k]]
+        return [(templates[row], float(scores[row])) for row in best]
+    
+    def generate_lor_content(self, student_id, template_id=None, purpose="", university="", program="", context=None,
+                             filters=None):
         """Generate tailored LOR content based on student data and selected template"""
-        # Convert string ID to ObjectId if needed
-        if isinstance(student_id, str):
-            try:
-                student_id_obj = ObjectId(student_id)
-            except:
-                return {"error": "Invalid student ID format"}
-        else:
-            student_id_obj = student_id
-            
+        if context is None:
+            context = RequestContext(self, student_id)
+        
+        if context.student_id_obj is None:
+            return {"error": "Invalid student ID format"}
+        
+        cache_key = None
+        if self.result_cache is not None:
+            # Any template change bumps the index version
+            self.template_index.refresh()
+            cache_key = ("generate", str(student_id), str(template_id or ""), purpose, university, program,
+                         repr(filters), self._cache_version(context), self.template_index.version)
+            cached = self.result_cache.get(cache_key, tag=str(student_id))
+            if cached is not None:
+                return dict(cached, dbRoundTrips=context.round_trips)
+        
+        result = self._generate_uncached(context, student_id, template_id, purpose, university, program, filters)
+        if cache_key is not None and "error" not in result:
+            self.result_cache.put(cache_key, result, tag=str(student_id))
+        return dict(result, dbRoundTrips=context.round_trips) if "error" not in result else result
+    
+    def _generate_uncached(self, context, student_id, template_id, purpose, university, program, filters):
         # Get student data
-        student = self.student_collection.find_one({"_id": student_id_obj})
+        student = context.student
         if not student:
             return {"error": "Student not found"}
         
-        # Get student internships
-        internships = list(self.internship_collection.find({"studentId": student_id}))
-        
         # Find best template if not provided
         if not template_id:
-            template_result = self.find_best_template(student_id, purpose)
+            template_result = self.find_best_template(student_id, purpose, context=context, filters=filters)
             if "error" in template_result:
                 return template_result
             template = template_result["template"]
         else:
-            # Convert template_id to ObjectId if needed
-            if isinstance(template_id, str):
-                try:
-                    template_id_obj = ObjectId(template_id)
-                except:
-                    return {"error": "Invalid template ID format"}
-            else:
-                template_id_obj = template_id
-                
-            template = self.template_collection.find_one({"_id": template_id_obj})
+            template_id_obj = _to_object_id(template_id)
+            if template_id_obj is None:
+                return {"error": "Invalid template ID format"}
+            
+            template = context.find_one(self.template_collection, {"_id": template_id_obj})
             if not template:
                 return {"error": "Template not found"}
         
+        # Strengths are only needed when the template asks for them
+        strengths = insights = None
+        if self.renderer.compile(template).uses("strengths"):
+            analysis = context.analysis()
+            strengths = analysis.get("strengths", [])
+            insights = analysis.get("insights")
+        
+        return self._render_lor(template, student, context.internships, strengths, purpose, university, program,
+                                insights)
+    
+    def generate_lor_batch(self, requests):
+        """Generate many letters, fetching all student and template documents up front
+        
+        Each request is a dict with studentId and optional templateId, purpose,
+        university, program and template filters. Results come back in input order with errors
+        reported per request, as generate_lor_content would.
+        """
+        requests = list(requests)
+        student_ids = [r.get("studentId") for r in requests]
+        object_ids = [_to_object_id(i) for i in student_ids]
+        students, internships, placements = self._fetch_cohort(student_ids, object_ids)
+        
+        # Explicitly requested templates are fetched together as well
+        template_ids = {r["templateId"]: _to_object_id(r["templateId"]) for r in requests if r.get("templateId")}
+        wanted = [o for o in template_ids.values() if o is not None]
+        templates = {t["_id"]: t for t in self.template_collection.find({"_id": {"$in": wanted}})} if wanted else {}
+        
+        # One batched spaCy pass for every student found (when enabled)
+        found = [(students[o], internships.get(str(i), [])) for i, o in zip(student_ids, object_ids)
+                 if o is not None and o in students]
+        insights = dict(zip((id(student) for student, _ in found), self._insights_many(found)))
+        
+        results = []
+        for request, student_id, student_id_obj in zip(requests, student_ids, object_ids):
+            if student_id_obj is None:
+                results.append({"error": "Invalid student ID format"})
+                continue
+            student = students.get(student_id_obj)
+            if not student:
+                results.append({"error": "Student not found"})
+                continue
+            
+            student_internships = internships.get(str(student_id), [])
+            analysis = self._analyze_documents(student, student_internships, placements.get(str(student_id), []),
+                                               insights.get(id(student)))
+            purpose = request.get("purpose", "")
+            
+            template_id = request.get("templateId")
+            if not template_id:
+                template_result = self._match_template(analysis, purpose, filters=request.get("filters"))
+                if "error" in template_result:
+                    results.append(template_result)
+                    continue
+                template = template_result["template"]
+            elif template_ids[template_id] is None:
+                results.append({"error": "Invalid template ID format"})
+                continue
+            else:
+                template = templates.get(template_ids[template_id])
+                if not template:
+                    results.append({"error": "Template not found"})
+                    continue
+            
+            results.append(self._render_lor(template, student, student_internships, analysis["strengths"],
+                                            purpose, request.get("university", ""), request.get("program", ""),
+                                            analysis.get("insights")))
+        return results
+    
+    @METRICS.timed("render")
+    def _render_lor(self, template, student, internships, strengths, purpose, university, program, insights=None):
+        """Fill a template from already-fetched student documents"""
         # Prepare student data for template filling
         department_name = "Engineering"
         if "department" in student:
@@ -318,44 +772,33 @@ class LORRecommendationAI:
             "program": program
         }
         
-        # Fill template with student data
-        content = template["content"]
-        
-        # Replace basic student data
-        content = content.replace("{{name}}", student_data["name"])
-        content = content.replace("{{rollNo}}", str(student_data["rollNo"]))
-        content = content.replace("{{department}}", student_data["department"])
-        content = content.replace("{{cgpa}}", str(student_data["cgpa"]))
-        content = content.replace("{{university}}", university)
-        content = content.replace("{{program}}", program)
-        content = content.replace("{{purpose}}", purpose)
-        
-        # Replace arrays (skills, achievements)
-        if student_data["skills"]:
-            content = content.replace("{{skills}}", ", ".join(student_data["skills"]))
-        else:
-            content = content.replace("{{skills}}", "various technical skills")
-            
-        if student_data["achievements"]:
-            content = content.replace("{{achievements}}", ", ".join(student_data["achievements"]))
-        else:
-            content = content.replace("{{achievements}}", "academic achievements")
-            
+        # Fill template with student data in a single pass
+        compiled = self.renderer.compile(template)
+        values = {
+            # Basic student data
+            "name": student_data["name"],
+            "rollNo": str(student_data["rollNo"]),
+            "department": student_data["department"],
+            "cgpa": str(student_data["cgpa"]),
+            "university": university,
+            "program": program,
+            "purpose": purpose,
+            # Arrays (skills, achievements)
+            "skills": ", ".join(student_data["skills"]) if student_data["skills"] else "various technical skills",
+            "achievements": ", ".join(student_data["achievements"]) if student_data["achievements"] else "academic achievements"
+        }
+        
         # Handle internships
         if student_data["internships"]:
-            internship_text = ", ".join([f"{i['position']} at {i['company']}" for i in student_data["internships"]])
-            content = content.replace("{{internships}}", internship_text)
+            values["internships"] = ", ".join([f"{i['position']} at {i['company']}" for i in student_data["internships"]])
         else:
-            content = content.replace("{{internships}}", "academic projects")
+            values["internships"] = "academic projects"
             
         # Generate strengths paragraph if needed
-        if "{{strengths}}" in content:
-            # Get student strengths
-            analysis = self.analyze_student(student_id)
-            strengths = analysis.get("strengths", [])
+        if compiled.uses("strengths"):
+            strengths = strengths or []
             
             strengths_paragraph = ""
-            
             if "academic" in strengths:
                 strengths_paragraph += f"{student_data['name']} has demonstrated exceptional academic abilities, maintaining a CGPA of {student_data['cgpa']}. "
             
@@ -364,37 +807,380 @@ class LORRecommendationAI:
                 strengths_paragraph += f"Their technical proficiency in {top_skills} is particularly noteworthy. "
             
             if "leadership" in strengths:
-                strengths_paragraph += "They have displayed excellent leadership qualities through their involvement in various activities. "
+                leadership_roles = self._leadership_roles(insights)
+                if leadership_roles:
+                    strengths_paragraph += f"They have displayed excellent leadership qualities, serving as {' and '.join(leadership_roles[:2])}. "
+                else:
+                    strengths_paragraph += "They have displayed excellent leadership qualities through their involvement in various activities. "
             
             if "practical" in strengths:
-                strengths_paragraph += "Their practical experience through internships has prepared them well for further studies and professional challenges. "
+                organizations = (insights or {}).get("organizations", [])
+                if organizations:
+                    strengths_paragraph += f"Their practical experience with {', '.join(organizations[:3])} has prepared them well for further studies and professional challenges. "
+                else:
+                    strengths_paragraph += "Their practical experience through internships has prepared them well for further studies and professional challenges. "
                 
-            content = content.replace("{{strengths}}", strengths_paragraph)
+            values["strengths"] = strengths_paragraph
+        
+        content = compiled.render(values)
             
         return {
             "generatedContent": content,
             "templateUsed": str(template["_id"]),
             "studentName": student_data["name"]
         }
+    
+    def get_templates(self):
+        """Return all LOR templates with ObjectIds converted to strings"""
+        template_list = []
+        for t in self.template_collection.find():
+            t["_id"] = str(t["_id"])
+            template_list.append(t)
+        return template_list
+
+    def check_templates(self):
+        """Report unknown and missing placeholders for every template"""
+        return [self.renderer.check(t) for t in self.template_collection.find()]
+
+def _json_default(value):
+    """Serialize the BSON types that show up in Mongo documents"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def to_json(payload):
+    """JSON-encode a result that may contain ObjectIds or datetimes"""
+    return json.dumps(payload, default=_json_default)
+
+# Operations exposed to long-lived callers (daemon mode)
+def _rpc_analyze(recommender, student_id):
+    return recommender.analyze_student(student_id)
+
+def _rpc_generate(recommender, student_id, template_id=None, purpose="", university="", program="", filters=None,
+                  polish=None):
+    result = recommender.generate_lor_content(student_id, template_id, purpose, university, program, filters=filters)
+    if polish:
+        from neural_polish import polish_results
+        result = polish_results([result], polish)[0]
+    return result
+
+def _rpc_find_templates(recommender, student_id, purpose="", top_k=5, filters=None, match_mode=None):
+    return recommender.find_best_template(student_id, purpose, top_k=top_k, filters=filters, match_mode=match_mode)
+
+def _rpc_get_templates(recommender):
+    return recommender.get_templates()
+
+def _rpc_cache_stats(recommender):
+    if recommender.result_cache is None:
+        return {"enabled": False}
+    return dict(recommender.result_cache.stats(), enabled=True)
+
+def _rpc_invalidate_cache(recommender, student_id=None):
+    if recommender.result_cache is not None:
+        recommender.result_cache.invalidate(str(student_id) if student_id else None)
+    return {"invalidated": student_id or "all"}
+
+def _rpc_metrics(recommender, format="json"):
+    if format == "prometheus":
+        return METRICS.prometheus()
+    return METRICS.snapshot()
+
+def _rpc_explain(recommender, student_id=None):
+    return recommender.explain(student_id)
+
+def _rpc_check_templates(recommender):
+    return recommender.check_templates()
+
+def _rpc_analyze_batch(recommender, student_ids, vectorized=False):
+    return recommender.analyze_students(student_ids, vectorized=vectorized)
+
+def _rpc_generate_batch(recommender, requests, polish=None):
+    results = recommender.generate_lor_batch(requests)
+    if polish:
+        from neural_polish import polish_results
+        results = polish_results(results, polish)
+    return results
+
+def _rpc_polish(recommender, texts, mode="summarize"):
+    from neural_polish import get_polisher
+    return get_polisher().polish_many(texts, mode)
+
+def _rpc_similar_letters(recommender, text, threshold=None, limit=10):
+    return recommender.letter_index.query(text, threshold, limit)
+
+def _rpc_index_letters(recommender, letters):
+    index = recommender.letter_index
+    index.add_many((letter["key"], letter["text"]) for letter in letters)
+    # Inserted letters exist nowhere else, so keep them across restarts
+    recommender.save_letter_index()
+    return {"indexed": len(letters), "total": len(index)}
+
+def _rpc_letter_clusters(recommender, threshold=None, min_size=2):
+    return recommender.letter_index.clusters(threshold, min_size)
+
+def _rpc_list_analyses(recommender, primary_field=None, strength=None, skip=0, limit=100):
+    if recommender.analysis_view is None:
+        return {"error": "The analysis view is not enabled (serve --analysis-view)"}
+    return recommender.analysis_view.list(primary_field, strength, skip, limit)
+
+def _rpc_refresh_analyses(recommender, student_ids=None):
+    if recommender.analysis_view is None:
+        return {"error": "The analysis view is not enabled (serve --analysis-view)"}
+    if student_ids is None:
+        return recommender.analysis_view.rebuild()
+    return recommender.analysis_view.refresh(student_ids)
+
+RPC_METHODS = {
+    "analyze": _rpc_analyze,
+    "generate": _rpc_generate,
+    "get_templates": _rpc_get_templates,
+    "analyze_batch": _rpc_analyze_batch,
+    "generate_batch": _rpc_generate_batch,
+    "check_templates": _rpc_check_templates,
+    "find_templates": _rpc_find_templates,
+    "cache_stats": _rpc_cache_stats,
+    "invalidate_cache": _rpc_invalidate_cache,
+    "metrics": _rpc_metrics,
+    "explain": _rpc_explain,
+    "polish": _rpc_polish,
+    "list_analyses": _rpc_list_analyses,
+    "refresh_analyses": _rpc_refresh_analyses,
+    "similar_letters": _rpc_similar_letters,
+    "index_letters": _rpc_index_letters,
+    "letter_clusters": _rpc_letter_clusters,
+}
+
+def check_params(method, params):
+    """Raise TypeError when params do not fit the method's handler (arity, unknown names)"""
+    import inspect
+    if params is None:
+        args, kwargs = [], {}
+    elif isinstance(params, dict):
+        args, kwargs = [], {k: v for k, v in params.items() if k != "debug"}
+    elif isinstance(params, list):
+        args, kwargs = params, {}
+    else:
+        raise TypeError("params must be an array or an object")
+    try:
+        inspect.signature(RPC_METHODS[method]).bind(None, *args, **kwargs)
+    except TypeError as e:
+        raise TypeError(f"Invalid params for {method}: {e}") from None
+
+
+def dispatch(recommender, method, params=None, debug=False):
+    """Run a named operation; params may be a list (positional) or a dict (keyword)
+    
+    Every call is counted and timed in METRICS. With debug (or "debug": true
+    among dict params) the per-stage trace is attached to a dict result.
+    Unknown methods raise ValueError, so a KeyError can only come from
+    inside a handler.
+    """
+    if method not in RPC_METHODS:
+        raise ValueError(f"Method not found: {method}")
+    handler = RPC_METHODS[method]
+    if isinstance(params, dict) and "debug" in params:
+        params = dict(params)
+        debug = bool(params.pop("debug")) or debug
+    
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        with trace() as stages:
+            if params is None:
+                result = handler(recommender)
+            elif isinstance(params, dict):
+                result = handler(recommender, **params)
+            else:
+                result = handler(recommender, *params)
+        if isinstance(result, dict) and "error" in result:
+            status = "error"
+    except Exception:
+        status = "exception"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        METRICS.inc("lor_requests_total", method=method, status=status)
+        METRICS.observe("lor_request_seconds", elapsed, method=method)
+    
+    if debug and isinstance(result, dict):
+        result = dict(result, trace={"totalMs": round(elapsed * 1000, 3), "stages": stages})
+    return result
+
+def _serve_main(argv):
+    import argparse
+    from lor_server import DEFAULT_HOST, DEFAULT_PORT, serve
+    from scheduler import BULK_CONCURRENCY, DEFAULT_WORKERS as SCHEDULER_WORKERS, QUEUES, Scheduler
+    
+    parser = argparse.ArgumentParser(prog="lor_recommendation_ai.py serve",
+                                     description="Run the LOR recommender as a JSON-RPC server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", dest="socket_path", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--watch-templates", action="store_true",
+                        help="Follow change streams (templates, cache invalidation, analysis view) instead of only polling")
+    parser.add_argument("--match-mode", choices=MATCH_MODES, default=DEFAULT_MATCH_MODE,
+                        help="How templates are matched to students")
+    parser.add_argument("--text-nlp", action="store_true", default=DEFAULT_TEXT_NLP,
+                        help="Extract roles, organizations and action verbs with spaCy during analysis")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="Cached analyze/generate results kept in memory (0 disables caching)")
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="Seconds a cached result stays valid")
+    parser.add_argument("--cache-dir", help="Also keep cached results on disk in this directory")
+    parser.add_argument("--cache-disk-entries", type=int, default=10000,
+                        help="Cached results kept on disk before the least recently used are removed")
+    parser.add_argument("--analysis-view", action="store_true",
+                        help="Serve analyses from the materialized student_analysis collection and keep it current")
+    parser.add_argument("--view-poll-interval", type=float, default=300.0,
+                        help="Seconds between full staleness checks of the analysis view")
+    parser.add_argument("--workers", type=int, default=SCHEDULER_WORKERS, help="Requests processed concurrently")
+    parser.add_argument("--bulk-concurrency", type=int, default=BULK_CONCURRENCY,
+                        help="Bulk-queue requests processed concurrently (kept below --workers)")
+    parser.add_argument("--max-pending", type=int, help="Waiting requests per queue before new ones are rejected")
+    parser.add_argument("--trace-log", help="Append every metrics event to this JSON Lines file")
+    args = parser.parse_args(argv)
+    
+    if args.trace_log:
+        from metrics import add_trace_log
+        add_trace_log(args.trace_log)
+    
+    result_cache = None
+    if args.cache_size > 0:
+        from result_cache import ResultCache
+        result_cache = ResultCache(max_entries=args.cache_size, ttl=args.cache_ttl, disk_dir=args.cache_dir,
+                                   disk_max_entries=args.cache_disk_entries)
+    
+    recommender = LORRecommendationAI(match_mode=args.match_mode, result_cache=result_cache, text_nlp=args.text_nlp)
+    # One set of change streams feeds both the result cache and the analysis view
+    student_listeners = []
+    if result_cache is not None:
+        student_listeners.append(result_cache.invalidate)
+    if args.analysis_view:
+        from analysis_view import AnalysisView
+        recommender.analysis_view = AnalysisView(recommender)
+        recommender.analysis_view.ensure_indexes()
+        if args.watch_templates:
+            student_listeners.append(recommender.analysis_view.on_change)
+            recommender.analysis_view.start_refresher()
+        recommender.analysis_view.poll(args.view_poll_interval)
+    if student_listeners and args.watch_templates:
+        from data_access import watch_student_changes
+        watch_student_changes(get_db(), student_listeners)
+        recommender.change_tracking = result_cache is not None
+    scheduler = Scheduler(recommender, workers=args.workers,
+                          limits={"bulk": max(min(args.bulk_concurrency, args.workers - 1), 1)},
+                          max_pending={queue: args.max_pending for queue in QUEUES} if args.max_pending else None)
+    serve(host=args.host, port=args.port, socket_path=args.socket_path, watch_templates=args.watch_templates,
+          recommender=recommender, scheduler=scheduler)
+
+def _print_startup_report():
+    print(json.dumps({"startupReport": startup_report()}), file=sys.stderr)
 
 # Command-line interface
 def main():
+    # --startup-report may appear anywhere; it prints per-import timings to stderr
+    if "--startup-report" in sys.argv:
+        sys.argv.remove("--startup-report")
+        atexit.register(_print_startup_report)
+    
+    # --snapshot DIR reads every collection from an offline snapshot
+    if "--snapshot" in sys.argv:
+        global SNAPSHOT_DIR
+        position = sys.argv.index("--snapshot")
+        if position + 1 >= len(sys.argv):
+            print("--snapshot needs a directory", file=sys.stderr)
+            sys.exit(1)
+        SNAPSHOT_DIR = sys.argv.pop(position + 1)
+        sys.argv.pop(position)
+        # Worker processes (bulk) pick it up from the environment
+        os.environ["LOR_SNAPSHOT_DIR"] = SNAPSHOT_DIR
+    
+    # --debug attaches the per-stage timing trace to analyze/generate output
+    debug = "--debug" in sys.argv
+    if debug:
+        sys.argv.remove("--debug")
+    
     if len(sys.argv) < 2:
         print("Usage: python lor_recommendation_ai.py <student_id> [purpose] [university] [program]")
+        print("       python lor_recommendation_ai.py serve [--host HOST] [--port PORT] [--socket PATH] [--watch-templates]")
+        print("       python lor_recommendation_ai.py stdio [--workers N] [--bulk-concurrency N] [--max-in-flight N]")
+        print("       python lor_recommendation_ai.py build_index")
+        print("       python lor_recommendation_ai.py snapshot <dir>")
+        print("       python lor_recommendation_ai.py diagnostics [student_id]")
+        print("       python lor_recommendation_ai.py materialize [student_id ...]")
+        print("       python lor_recommendation_ai.py dedupe [results.jsonl ...] [--threshold X] [--save]")
+        print("       python lor_recommendation_ai.py export --format jsonl|zip|docx|lor [--output PATH] [--query JSON]")
+        print("       python lor_recommendation_ai.py bulk <jobs.jsonl> <output.jsonl> [--workers N] [--chunk-size N] [--polish MODE]")
+        print("Add --startup-report to print per-import startup timings to stderr")
+        print("Add --debug to include per-stage timings in the result")
+        print("Add --snapshot DIR to read from an offline snapshot instead of MongoDB")
         sys.exit(1)
+    
+    # Long-lived server mode: load everything once and serve many requests
+    if sys.argv[1] == "serve":
+        _serve_main(sys.argv[2:])
+        sys.exit(0)
+    
+    # Streaming mode: one child process answers NDJSON requests piped to stdin
+    if sys.argv[1] == "stdio":
+        from lor_stdio import stdio_main
+        stdio_main(sys.argv[2:])
+        sys.exit(0)
+    
+    # Build step: fit the template index and persist it for warm starts
+    if sys.argv[1] == "build_index":
+        recommender = LORRecommendationAI()
+        if not recommender.template_index.artifact_dir:
+            print(json.dumps({"error": "Template index artifacts are disabled (LOR_TEMPLATE_ARTIFACT_DIR is empty)"}))
+            sys.exit(1)
+        print(to_json(recommender.template_index.build_artifact()))
+        sys.exit(0)
+    
+    # Offline snapshot: dump the collections for memory-mapped, database-free runs
+    if sys.argv[1] == "snapshot":
+        from snapshot import snapshot_main
+        snapshot_main(sys.argv[2:])
+        sys.exit(0)
+    
+    # Diagnostics: index report and query plans for every access path
+    if sys.argv[1] == "diagnostics":
+        recommender = LORRecommendationAI()
+        print(to_json(recommender.explain(sys.argv[2] if len(sys.argv) > 2 else None)))
+        sys.exit(0)
+    
+    # Materialized analyses: bring student_analysis up to date (all students, or the given ones)
+    if sys.argv[1] == "materialize":
+        from analysis_view import AnalysisView
+        view = AnalysisView(LORRecommendationAI())
+        view.ensure_indexes()
+        print(to_json(view.refresh(sys.argv[2:]) if len(sys.argv) > 2 else view.rebuild()))
+        sys.exit(0)
+    
+    # Near-duplicate detection: cluster stored and freshly generated letters
+    if sys.argv[1] == "dedupe":
+        from letter_similarity import dedupe_main
+        dedupe_main(sys.argv[2:])
+        sys.exit(0)
+    
+    # Export: stream a whole cohort's letters to a file or the Lor collection
+    if sys.argv[1] == "export":
+        from lor_export import export_main
+        export_main(sys.argv[2:])
+        sys.exit(0)
+    
+    # Bulk mode: generate letters for a whole jobs file across worker processes
+    if sys.argv[1] == "bulk":
+        from bulk_generate import bulk_main
+        bulk_main(sys.argv[2:])
+        sys.exit(0)
         
     student_id = sys.argv[1]
     
     # Check if we're just getting templates
     if len(sys.argv) > 2 and sys.argv[2] == "get_templates":
         recommender = LORRecommendationAI()
-        templates = recommender.template_collection.find()
-        # Convert ObjectId to string for JSON serialization
-        template_list = []
-        for t in templates:
-            t["_id"] = str(t["_id"])
-            template_list.append(t)
-        print(json.dumps(template_list))
+        print(to_json(recommender.get_templates()))
         sys.exit(0)
         
     purpose = sys.argv[2] if len(sys.argv) > 2 else "Graduate School"
@@ -406,12 +1192,14 @@ def main():
     # Check if enough arguments for LOR generation
     if len(sys.argv) > 2:
         # Generate LOR content
-        lor = recommender.generate_lor_content(student_id, None, purpose, university, program)
+        lor = dispatch(recommender, "generate", [student_id, None, purpose, university, program], debug=debug)
         print(json.dumps(lor))
     else:
         # Just analyze student
-        analysis = recommender.analyze_student(student_id)
+        analysis = dispatch(recommender, "analyze", [student_id], debug=debug)
         print(json.dumps(analysis))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Let helper modules import this script by name without re-running it
+    sys.modules.setdefault("lor_recommendation_ai", sys.modules[__name__])
+    main()
@@ -0,0 +1,166 @@
+import json
+import os
+import socketserver
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lor_recommendation_ai import METRICS, RPC_METHODS, LORRecommendationAI, check_params, to_json
+from scheduler import Overloaded, Scheduler
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SERVER_BUSY = -32000
+
+
+class LORRequestHandler(BaseHTTPRequestHandler):
+    """Serve JSON-RPC calls against the shared recommender"""
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def log_message(self, format, *args):
+        print(f"[LOR server] {self.address_string()} {format % args}", file=sys.stderr)
+
+    def do_GET(self):
+        if self.path == "/health":
+            templates = self.server.recommender.templates
+            self._send_json(200, {"status": "ok", "templates": len(templates) if templates is not None else None,
+                                  "scheduler": self.server.scheduler.stats()})
+        elif self.path == "/metrics":
+            self._send(200, METRICS.prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self._send_json(200, _rpc_error(None, PARSE_ERROR, "Parse error"))
+            return
+
+        # Batch calls are all queued first, then answered as a list in the same order;
+        # an empty batch is one invalid request, not an empty answer
+        if payload == []:
+            self._send_json(200, _rpc_error(None, INVALID_REQUEST, "Invalid request"))
+        elif isinstance(payload, list):
+            submitted = [self._submit_call(call) for call in payload]
+            self._send_json(200, [self._response(*entry) for entry in submitted])
+        else:
+            self._send_json(200, self._response(*self._submit_call(payload)))
+
+    def _submit_call(self, call):
+        """(call, future) for a call handed to the scheduler, or (call, error response)"""
+        if not isinstance(call, dict) or "method" not in call:
+            return call, _rpc_error(None, INVALID_REQUEST, "Invalid request")
+
+        call_id = call.get("id")
+        if call["method"] not in RPC_METHODS:
+            return call, _rpc_error(call_id, METHOD_NOT_FOUND, f"Method not found: {call['method']}")
+        try:
+            check_params(call["method"], call.get("params"))
+        except TypeError as e:
+            return call, _rpc_error(call_id, INVALID_PARAMS, str(e))
+
+        # "queue": "bulk" lets batch clients yield to interactive requests
+        try:
+            return call, self.server.scheduler.submit(call["method"], call.get("params"), call.get("queue"),
+                                                      debug=bool(call.get("debug")))
+        except Overloaded as e:
+            return call, _rpc_error(call_id, SERVER_BUSY, str(e))
+        except ValueError as e:
+            return call, _rpc_error(call_id, INVALID_REQUEST, str(e))
+
+    def _response(self, call, future):
+        if isinstance(future, dict):
+            return future
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[LOR server] {call['method']} failed: {e}", file=sys.stderr)
+            return _rpc_error(call.get("id"), INTERNAL_ERROR, str(e))
+
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    def _send_json(self, status, payload):
+        self._send(status, to_json(payload).encode("utf-8"), "application/json")
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server bound to a Unix domain socket"""
+    daemon_threads = True
+
+    def server_bind(self):
+        # Remove a stale socket left behind by a previous run
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+
+
+def _rpc_error(call_id, code, message):
+    return {"jsonrpc": "2.0", "id": call_id, "error": {"code": code, "message": message}}
+
+
+def create_server(recommender=None, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, scheduler=None):
+    """Build a threaded JSON-RPC server around one long-lived recommender
+
+    Connection threads only parse and wait; the work itself runs on the
+    scheduler's workers.
+    """
+    if recommender is None:
+        recommender = LORRecommendationAI()
+        recommender.warm()
+    if scheduler is None:
+        scheduler = Scheduler(recommender)
+
+    if socket_path:
+        server = ThreadingUnixHTTPServer(socket_path, LORRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), LORRequestHandler)
+        server.daemon_threads = True
+
+    server.recommender = recommender
+    server.scheduler = scheduler
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, watch_templates=False, recommender=None,
+          scheduler=None):
+    """Load models and templates once, then serve requests until interrupted"""
+    if recommender is not None:
+        recommender.warm()
+    server = create_server(recommender, host=host, port=port, socket_path=socket_path, scheduler=scheduler)
+    if watch_templates:
+        server.recommender.template_index.watch()
+    where = socket_path or f"http://{host}:{port}"
+    print(f"[LOR server] Listening on {where}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.recommender.save_letter_index()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,124 @@
+import json
+import sys
+import threading
+
+from lor_recommendation_ai import RPC_METHODS, LORRecommendationAI, check_params, to_json
+from lor_server import INTERNAL_ERROR, INVALID_PARAMS, INVALID_REQUEST, METHOD_NOT_FOUND, PARSE_ERROR, _rpc_error
+from scheduler import BULK_CONCURRENCY, Scheduler
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_IN_FLIGHT = 32
+
+
+class StdioServer:
+    """Answer newline-delimited JSON-RPC requests from a stream
+
+    Each input line is {"id", "method", "params"} using the same methods as
+    the HTTP server (analyze, generate, get_templates, ...). Responses are
+    written one per line as soon as each request finishes, so they may come
+    back out of order; the id correlates them. At most max_in_flight requests
+    are read ahead, which keeps memory bounded however much is piped in.
+    Requests run on a Scheduler, so "queue": "bulk" calls yield to interactive
+    ones and identical in-flight calls are answered once.
+    """
+
+    def __init__(self, recommender=None, workers=DEFAULT_WORKERS, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 stdin=None, stdout=None, scheduler=None):
+        self.recommender = recommender or LORRecommendationAI()
+        self.scheduler = scheduler or Scheduler(self.recommender, workers=workers)
+        self.max_in_flight = max(max_in_flight, 1)
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._write_lock = threading.Lock()
+
+    def run(self):
+        """Process requests until end of input, then wait for the stragglers"""
+        self.recommender.warm()
+        for line in self.stdin:
+            if not line.strip():
+                continue
+            # Stop reading while the pipeline is full
+            self._slots.acquire()
+            self._handle_line(line)
+        # Every slot is released once its response is written
+        for _ in range(self.max_in_flight):
+            self._slots.acquire()
+        self.recommender.save_letter_index()
+
+    def _handle_line(self, line):
+        try:
+            call = json.loads(line)
+        except ValueError:
+            self._respond(_rpc_error(None, PARSE_ERROR, "Parse error"))
+            return
+
+        if not isinstance(call, dict) or "method" not in call:
+            self._respond(_rpc_error(None, INVALID_REQUEST, "Invalid request"))
+            return
+        call_id = call.get("id")
+        if call["method"] not in RPC_METHODS:
+            self._respond(_rpc_error(call_id, METHOD_NOT_FOUND, f"Method not found: {call['method']}"))
+            return
+        try:
+            check_params(call["method"], call.get("params"))
+        except TypeError as e:
+            self._respond(_rpc_error(call_id, INVALID_PARAMS, str(e)))
+            return
+
+        # A full queue blocks here, which stops reading stdin until work drains
+        try:
+            future = self.scheduler.submit(call["method"], call.get("params"), call.get("queue"),
+                                           debug=bool(call.get("debug")), block=True)
+        except ValueError as e:
+            self._respond(_rpc_error(call_id, INVALID_REQUEST, str(e)))
+            return
+        future.add_done_callback(lambda done: self._respond(self._response(call, done)))
+
+    def _response(self, call, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"[LOR stdio] {call['method']} failed: {e}", file=sys.stderr)
+            return _rpc_error(call.get("id"), INTERNAL_ERROR, str(e))
+
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    def _respond(self, response):
+        # The slot must come back even if the response cannot be written, or run() never finishes
+        try:
+            self._write(response)
+        finally:
+            self._slots.release()
+
+    def _write(self, response):
+        data = to_json(response)
+        with self._write_lock:
+            self.stdout.write(data + "\n")
+            self.stdout.flush()
+
+
+def stdio_main(argv):
+    import argparse
+    from lor_recommendation_ai import DEFAULT_MATCH_MODE, MATCH_MODES
+
+    parser = argparse.ArgumentParser(prog="lor_recommendation_ai.py stdio",
+                                     description="Answer NDJSON requests on stdin with NDJSON responses on stdout")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Requests processed concurrently")
+    parser.add_argument("--bulk-concurrency", type=int, default=BULK_CONCURRENCY,
+                        help="Bulk-queue requests processed concurrently (kept below --workers)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Requests read ahead of their responses")
+    parser.add_argument("--match-mode", choices=MATCH_MODES, default=DEFAULT_MATCH_MODE,
+                        help="How templates are matched to students")
+    parser.add_argument("--trace-log", help="Append every metrics event to this JSON Lines file")
+    args = parser.parse_args(argv)
+
+    if args.trace_log:
+        from metrics import add_trace_log
+        add_trace_log(args.trace_log)
+
+    recommender = LORRecommendationAI(match_mode=args.match_mode)
+    scheduler = Scheduler(recommender, workers=args.workers,
+                          limits={"bulk": max(min(args.bulk_concurrency, args.workers - 1), 1)})
+    StdioServer(recommender, max_in_flight=args.max_in_flight, scheduler=scheduler).run()
@@ -0,0 +1,209 @@
+import contextvars
+import functools
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage timings of the request running in the current thread/task, when traced
+_current_trace = contextvars.ContextVar("lor_trace", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for slot, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            slot = len(self.buckets)
+        self.counts[slot] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics:
+    """Counters and histograms for request stages, with pluggable sinks
+
+    Sinks are callables receiving every observation as an event dict
+    ({"type", "name", "labels", "value"}); prometheus() and snapshot()
+    export the aggregated state as Prometheus text or JSON.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        self._sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        self._sinks.remove(sink)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit("counter", name, labels, value)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+        self._emit("histogram", name, labels, value)
+
+    def _emit(self, kind, name, labels, value):
+        for sink in self._sinks:
+            try:
+                sink({"type": kind, "name": name, "labels": labels, "value": value})
+            except Exception as e:
+                print(f"Warning: metrics sink failed ({e})", file=sys.stderr)
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """Time a block as one request stage
+
+        Records lor_stage_seconds{stage=name}, counts failures in
+        lor_stage_errors_total and appends to the request trace, if any.
+        """
+        trace = _current_trace.get()
+        entry = None
+        if trace is not None:
+            entry = {"stage": name, "depth": trace["depth"], **labels}
+            trace["stages"].append(entry)
+            trace["depth"] += 1
+
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("lor_stage_errors_total", stage=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe("lor_stage_seconds", elapsed, stage=name)
+            if entry is not None:
+                entry["ms"] = round(elapsed * 1000, 3)
+                trace["depth"] -= 1
+
+    def timed(self, name):
+        """Decorator form of stage()"""
+        def decorate(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        """JSON-friendly dump of every counter and histogram"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), "count": h.count, "sum": round(h.sum, 6),
+                           "mean": round(h.sum / h.count, 6) if h.count else 0.0,
+                           "buckets": {_format_bound(bound): total for bound, total in h.cumulative()}}
+                          for (name, labels), h in sorted(self._histograms.items())]
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), h in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                for bound, total in h.cumulative():
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_bound(bound)),))} {total}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+@contextmanager
+def trace():
+    """Collect the stages run inside the block; yields the list of stage entries"""
+    state = {"stages": [], "depth": 0}
+    token = _current_trace.set(state)
+    try:
+        yield state["stages"]
+    finally:
+        _current_trace.reset(token)
+
+
+def json_lines_sink(stream, **fields):
+    """Sink writing one JSON event per line to stream, with fields added to every event"""
+    lock = threading.Lock()
+
+    def sink(event):
+        line = json.dumps(dict(event, time=round(time.time(), 6), **fields))
+        with lock:
+            stream.write(line + "\n")
+            stream.flush()
+    return sink
+
+
+def add_trace_log(path, metrics=None, **fields):
+    """Append every metrics event to the JSON Lines file at path (--trace-log)
+
+    The file is opened in append mode, so several processes can share it;
+    pass e.g. pid=os.getpid() to tell their events apart.
+    """
+    stream = open(path, "a", encoding="utf-8")
+    return (metrics or METRICS).add_sink(json_lines_sink(stream, **fields))
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Process-wide registry used by the recommender
+METRICS = Metrics()
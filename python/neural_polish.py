@@ -0,0 +1,235 @@
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from lor_recommendation_ai import _timed_import
+from metrics import METRICS
+
+# Models are read from disk only (never downloaded): put the Hugging Face
+# snapshots of facebook/bart-large-cnn and gpt2 under LOR_MODEL_DIR
+MODEL_DIR = os.getenv("LOR_MODEL_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+SUMMARIZER_PATH = os.getenv("LOR_SUMMARIZER_PATH") or os.path.join(MODEL_DIR, "bart-large-cnn")
+GENERATOR_PATH = os.getenv("LOR_GENERATOR_PATH") or os.path.join(MODEL_DIR, "gpt2")
+
+# Throughput/latency knobs
+MAX_BATCH_SIZE = int(os.getenv("LOR_POLISH_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("LOR_POLISH_MAX_WAIT_MS", "10"))
+BUCKET_WIDTH = int(os.getenv("LOR_POLISH_BUCKET_WIDTH", "32"))  # tokens
+QUANTIZE = os.getenv("LOR_POLISH_QUANTIZE", "0") not in ("0", "false", "no")
+NUM_THREADS = int(os.getenv("LOR_POLISH_THREADS", "0"))  # 0 keeps torch's default
+SUMMARY_MAX_TOKENS = int(os.getenv("LOR_POLISH_SUMMARY_TOKENS", "256"))
+EXPAND_NEW_TOKENS = int(os.getenv("LOR_POLISH_NEW_TOKENS", "60"))
+NUM_BEAMS = int(os.getenv("LOR_POLISH_BEAMS", "2"))
+
+POLISH_MODES = ("summarize", "expand")
+
+
+class MicroBatcher:
+    """Coalesce single submissions from many threads into model batches
+
+    A batch is dispatched when max_batch_size items are waiting or the first
+    item has waited max_wait seconds, whichever comes first.
+    """
+
+    def __init__(self, process, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT_MS / 1000, name="micro-batcher"):
+        self.process = process
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            METRICS.inc("lor_polish_batches_total")
+            METRICS.inc("lor_polish_items_total", len(batch))
+            try:
+                results = self.process([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class _GenerationModel:
+    """One tokenizer/model pair with length-bucketed batched generation"""
+
+    def __init__(self, path, causal, max_input_tokens, quantize=QUANTIZE, num_threads=NUM_THREADS):
+        self.path = path
+        self.causal = causal
+        self.max_input_tokens = max_input_tokens
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.tokenizer = None
+        self.model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self.model is not None:
+                return
+            if not os.path.isdir(self.path):
+                raise RuntimeError(f"Model not found at {self.path}; copy the model snapshot there "
+                                   "(it is never downloaded at runtime)")
+            torch = _timed_import("torch")
+            transformers = _timed_import("transformers")
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+
+            with METRICS.stage("model_load", path=self.path):
+                tokenizer = transformers.AutoTokenizer.from_pretrained(self.path, local_files_only=True)
+                model_class = transformers.AutoModelForCausalLM if self.causal else transformers.AutoModelForSeq2SeqLM
+                model = model_class.from_pretrained(self.path, local_files_only=True)
+                model.eval()
+                if self.causal:
+                    # Decoder-only models continue from the right edge, so pad and truncate on the left
+                    tokenizer.pad_token = tokenizer.pad_token or tokenizer.eos_token
+                    tokenizer.padding_side = "left"
+                    tokenizer.truncation_side = "left"
+                if self.quantize:
+                    # int8 weights for every Linear layer; activations stay float
+                    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.tokenizer, self.model = tokenizer, model
+
+    def generate(self, texts, max_batch_size=MAX_BATCH_SIZE, bucket_width=BUCKET_WIDTH, **generate_kwargs):
+        """Generated text for each input, in input order"""
+        self.load()
+        torch = _timed_import("torch")
+
+        encoded = self.tokenizer(list(texts), truncation=True, max_length=self.max_input_tokens)
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+
+        # Similar lengths share a batch, so each batch pads only to its own longest input
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        batches = []
+        for index in order:
+            batch = batches[-1] if batches else None
+            if batch is None or len(batch) >= max_batch_size or lengths[index] - lengths[batch[0]] > bucket_width:
+                batches.append([index])
+            else:
+                batch.append(index)
+
+        outputs = [None] * len(lengths)
+        for batch in batches:
+            features = self.tokenizer.pad({"input_ids": [encoded["input_ids"][i] for i in batch],
+                                           "attention_mask": [encoded["attention_mask"][i] for i in batch]},
+                                          return_tensors="pt")
+            with METRICS.stage("polish_forward", size=len(batch)), torch.inference_mode():
+                generated = self.model.generate(**features, pad_token_id=self.tokenizer.pad_token_id,
+                                                **generate_kwargs)
+            if self.causal:
+                # Keep only the continuation, not the echoed prompt
+                generated = generated[:, features["input_ids"].shape[1]:]
+            for index, text in zip(batch, self.tokenizer.batch_decode(generated, skip_special_tokens=True)):
+                outputs[index] = text.strip()
+        return outputs
+
+
+class NeuralPolisher:
+    """Model-based rewrite of generated letters
+
+    "summarize" condenses a letter with BART (CNN summarization); "expand"
+    appends a GPT-2 continuation. polish() is for concurrent single requests
+    and goes through a micro-batcher; polish_many() batches a known list
+    directly, as bulk runs do.
+    """
+
+    def __init__(self, summarizer_path=SUMMARIZER_PATH, generator_path=GENERATOR_PATH, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait_ms=MAX_WAIT_MS, bucket_width=BUCKET_WIDTH, quantize=QUANTIZE, num_threads=NUM_THREADS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.bucket_width = bucket_width
+        self.models = {
+            "summarize": _GenerationModel(summarizer_path, causal=False, max_input_tokens=1024,
+                                  quantize=quantize, num_threads=num_threads),
+            "expand": _GenerationModel(generator_path, causal=True, max_input_tokens=1024 - EXPAND_NEW_TOKENS,
+                               quantize=quantize, num_threads=num_threads),
+        }
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def polish(self, text, mode="summarize"):
+        """Polish one letter; concurrent callers are batched together"""
+        return self._batcher(mode).submit(text).result()
+
+    def polish_many(self, texts, mode="summarize"):
+        """Polish a list of letters in length-bucketed batches"""
+        texts = list(texts)
+        if not texts:
+            return []
+        model = self._model(mode)
+        if mode == "summarize":
+            return model.generate(texts, self.max_batch_size, self.bucket_width,
+                                  max_length=SUMMARY_MAX_TOKENS, num_beams=NUM_BEAMS, early_stopping=True)
+        continuations = model.generate(texts, self.max_batch_size, self.bucket_width,
+                                       max_new_tokens=EXPAND_NEW_TOKENS, do_sample=False)
+        return [f"{text.rstrip()} {continuation}".rstrip() for text, continuation in zip(texts, continuations)]
+
+    def warmup(self, mode="summarize"):
+        """Load the model for mode now instead of on the first polish"""
+        self._model(mode).load()
+
+    def _model(self, mode):
+        if mode not in self.models:
+            raise ValueError(f"polish mode must be one of {', '.join(POLISH_MODES)}")
+        return self.models[mode]
+
+    def _batcher(self, mode):
+        self._model(mode)
+        with self._lock:
+            if mode not in self._batchers:
+                self._batchers[mode] = MicroBatcher(lambda texts: self.polish_many(texts, mode), self.max_batch_size,
+                                                    self.max_wait_ms / 1000, name=f"polish-{mode}")
+            return self._batchers[mode]
+
+
+_polisher = None
+_polisher_lock = threading.Lock()
+
+
+def get_polisher():
+    """Process-wide NeuralPolisher configured from the environment"""
+    global _polisher
+    with _polisher_lock:
+        if _polisher is None:
+            _polisher = NeuralPolisher()
+    return _polisher
+
+
+def polish_results(results, mode, polisher=None):
+    """Replace generatedContent in successful generate results with polished text"""
+    polisher = polisher or get_polisher()
+    ok = [r for r in results if "error" not in r]
+    try:
+        if len(ok) == 1:
+            # A lone request joins whatever other threads are polishing right now
+            polished = [polisher.polish(ok[0]["generatedContent"], mode)]
+        else:
+            polished = polisher.polish_many([r["generatedContent"] for r in ok], mode)
+    except Exception as e:
+        # The template letter is still usable; report why it was not polished
+        print(f"Warning: neural polish failed ({e})", file=sys.stderr)
+        return [r if "error" in r else dict(r, polishError=str(e)) for r in results]
+    by_id = {id(r): dict(r, generatedContent=text, polished=mode) for r, text in zip(ok, polished)}
+    return [by_id.get(id(r), r) for r in results]
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300.0  # seconds
+DEFAULT_DISK_MAX_ENTRIES = 10000
+
+
+class ResultCache:
+    """LRU cache with per-entry TTL and an optional on-disk second tier
+
+    Keys are tuples that usually include a version fingerprint of every
+    document the result was computed from, so an edited document simply
+    stops matching its old entries. Entries are also tagged with a student
+    id so change notifications can drop them eagerly. The disk tier is an
+    LRU of at most disk_max_entries files.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, disk_dir=None,
+                 disk_max_entries=DEFAULT_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+
+        self._entries = OrderedDict()  # key -> (expires_at, tag, value)
+        self._disk_files = OrderedDict()  # file name -> None, least recently used first
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "diskHits": 0, "misses": 0, "evictions": 0,
+                       "expirations": 0, "invalidations": 0, "diskEvictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def get(self, key, tag=None):
+        """Cached value for key (stored with put(key, value, tag)), or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, _, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+        entry = self._read_disk(key, tag, now)
+        with self._lock:
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["diskHits"] += 1
+            self._store(key, entry)
+            return entry[2]
+
+    def put(self, key, value, tag=None):
+        entry = (time.time() + self.ttl, tag, value)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, tag=None):
+        """Drop every entry for one student (tag), or everything when tag is None"""
+        with self._lock:
+            stale = [k for k, (_, entry_tag, _) in self._entries.items() if tag is None or entry_tag == tag]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += len(stale)
+
+        if self.disk_dir:
+            self._invalidate_disk(tag)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), maxEntries=self.max_entries, ttl=self.ttl)
+            if self.disk_dir:
+                stats.update(diskSize=len(self._disk_files), diskMaxEntries=self.disk_max_entries)
+        lookups = stats["hits"] + stats["diskHits"] + stats["misses"]
+        stats["hitRate"] = round((stats["hits"] + stats["diskHits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+    # ------------------------------------------------------------------
+    # Disk tier: one pickle per entry, named "<tag hash>-<key hash>.pkl" so
+    # a student's entries can be dropped without opening any file. File
+    # mtimes carry the LRU order across restarts; each process bounds the
+    # files it knows of (those present at startup and those it wrote).
+
+    def _name(self, key, tag):
+        return f"{_digest(tag)}-{_digest(key)}.pkl"
+
+    def _scan_disk(self):
+        names = [name for name in os.listdir(self.disk_dir) if name.endswith(".pkl")]
+        mtimes = {}
+        for name in names:
+            try:
+                mtimes[name] = os.path.getmtime(os.path.join(self.disk_dir, name))
+            except OSError:
+                pass
+        for name in sorted(mtimes, key=mtimes.get):
+            self._disk_files[name] = None
+        self._evict_disk()
+
+    def _read_disk(self, key, tag, now):
+        if not self.disk_dir:
+            return None
+        name = self._name(key, tag)
+        path = os.path.join(self.disk_dir, name)
+        try:
+            with open(path, "rb") as f:
+                stored_key, entry = pickle.load(f)
+        except FileNotFoundError:
+            self._forget_disk(name)
+            return None
+        except Exception as e:
+            print(f"Warning: dropping unreadable cache entry {path} ({e})", file=sys.stderr)
+            self._forget_disk(name, remove=True)
+            return None
+
+        if stored_key != key:
+            return None
+        if entry[0] <= now:
+            self._forget_disk(name, remove=True)
+            with self._lock:
+                self._stats["expirations"] += 1
+            return None
+        with self._lock:
+            if name in self._disk_files:
+                self._disk_files.move_to_end(name)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        name = self._name(key, entry[1])
+        path = os.path.join(self.disk_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((key, entry), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Warning: could not write cache entry {path} ({e})", file=sys.stderr)
+            _remove(tmp_path)
+            return
+        with self._lock:
+            self._disk_files[name] = None
+            self._disk_files.move_to_end(name)
+            self._evict_disk()
+
+    def _evict_disk(self):
+        # Called with the lock held (or before the cache is shared)
+        while len(self._disk_files) > self.disk_max_entries:
+            name, _ = self._disk_files.popitem(last=False)
+            _remove(os.path.join(self.disk_dir, name))
+            self._stats["diskEvictions"] += 1
+
+    def _forget_disk(self, name, remove=False):
+        with self._lock:
+            self._disk_files.pop(name, None)
+        if remove:
+            _remove(os.path.join(self.disk_dir, name))
+
+    def _invalidate_disk(self, tag):
+        prefix = f"{_digest(tag)}-" if tag is not None else ""
+        with self._lock:
+            names = [name for name in self._disk_files if name.startswith(prefix)]
+            for name in names:
+                del self._disk_files[name]
+        for name in names:
+            _remove(os.path.join(self.disk_dir, name))
+
+
+def _digest(value):
+    return hashlib.sha256(repr(value).encode("utf-8")).hexdigest()[:32]
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from lor_recommendation_ai import dispatch
+from metrics import METRICS
+
+# Queues in priority order: a free worker always takes interactive work first
+QUEUES = ("interactive", "bulk")
+DEFAULT_WORKERS = int(os.getenv("LOR_SCHEDULER_WORKERS", "8"))
+BULK_CONCURRENCY = int(os.getenv("LOR_BULK_CONCURRENCY", "4"))
+MAX_PENDING = {
+    "interactive": int(os.getenv("LOR_MAX_PENDING_INTERACTIVE", "256")),
+    "bulk": int(os.getenv("LOR_MAX_PENDING_BULK", "1024")),
+}
+
+# Methods that go to the bulk queue unless the caller says otherwise
+BULK_METHODS = ("analyze_batch", "generate_batch", "refresh_analyses", "letter_clusters")
+
+# Read-only methods whose identical concurrent calls can share one execution
+COALESCED_METHODS = ("analyze", "generate", "get_templates", "find_templates", "analyze_batch", "generate_batch",
+                     "check_templates", "explain", "similar_letters", "list_analyses", "polish")
+
+
+class Overloaded(RuntimeError):
+    """A queue already holds as many waiting requests as it accepts"""
+
+
+class _Job:
+    __slots__ = ("method", "params", "debug", "queue", "key", "future", "enqueued")
+
+    def __init__(self, method, params, debug, queue, key):
+        self.method = method
+        self.params = params
+        self.debug = debug
+        self.queue = queue
+        self.key = key
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class Scheduler:
+    """Run RPC calls on a fixed pool of workers, by priority
+
+    Identical read-only calls that arrive while one is queued or running
+    share its result instead of running again (single flight). Each queue
+    has a concurrency limit: bulk is held below the worker count so
+    interactive requests always find a free worker, and pending interactive
+    work is always started first. A queue that is full either rejects new
+    calls with Overloaded or, with block=True, makes the caller wait.
+    """
+
+    def __init__(self, recommender, workers=DEFAULT_WORKERS, limits=None, max_pending=None):
+        self.recommender = recommender
+        self.workers = max(workers, 1)
+        self.limits = {"interactive": self.workers, "bulk": max(min(BULK_CONCURRENCY, self.workers - 1), 1)}
+        self.limits.update(limits or {})
+        self.max_pending = dict(MAX_PENDING, **(max_pending or {}))
+
+        self._pending = {queue: deque() for queue in QUEUES}
+        self._running = {queue: 0 for queue in QUEUES}
+        self._in_flight = {}  # coalescing key -> job
+        self._condition = threading.Condition()
+        for number in range(self.workers):
+            threading.Thread(target=self._work, name=f"lor-scheduler-{number}", daemon=True).start()
+
+    def submit(self, method, params=None, queue=None, debug=False, block=False):
+        """Future for the result of dispatch(method, params)"""
+        queue = queue or ("bulk" if method in BULK_METHODS else "interactive")
+        if queue not in QUEUES:
+            raise ValueError(f"queue must be one of {', '.join(QUEUES)}")
+        key = _coalescing_key(method, params, debug)
+
+        with self._condition:
+            job = self._in_flight.get(key) if key is not None else None
+            if job is not None:
+                METRICS.inc("lor_coalesced_total", method=method)
+                # An interactive caller waiting on queued bulk work moves it up
+                if QUEUES.index(queue) < QUEUES.index(job.queue) and job in self._pending[job.queue]:
+                    self._pending[job.queue].remove(job)
+                    job.queue = queue
+                    self._pending[queue].append(job)
+                    self._condition.notify_all()
+                return job.future
+
+            while len(self._pending[queue]) >= self.max_pending[queue]:
+                if not block:
+                    METRICS.inc("lor_rejected_total", queue=queue)
+                    raise Overloaded(f"The {queue} queue is full ({self.max_pending[queue]} waiting); retry later")
+                self._condition.wait()
+
+            job = _Job(method, params, debug, queue, key)
+            self._pending[queue].append(job)
+            if key is not None:
+                self._in_flight[key] = job
+            self._condition.notify_all()
+        return job.future
+
+    def call(self, method, params=None, queue=None, debug=False, block=False):
+        return self.submit(method, params, queue, debug, block).result()
+
+    def stats(self):
+        with self._condition:
+            queues = {queue: {"pending": len(self._pending[queue]), "running": self._running[queue],
+                              "limit": self.limits[queue], "maxPending": self.max_pending[queue]}
+                      for queue in QUEUES}
+            return {"workers": self.workers, "queues": queues, "inFlight": len(self._in_flight)}
+
+    def _next(self):
+        for queue in QUEUES:
+            if self._pending[queue] and self._running[queue] < self.limits[queue]:
+                return self._pending[queue].popleft()
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next()
+                self._running[job.queue] += 1
+                # A pending slot freed up for blocked submitters
+                self._condition.notify_all()
+
+            METRICS.observe("lor_queue_wait_seconds", time.perf_counter() - job.enqueued, queue=job.queue)
+            result = error = None
+            try:
+                result = dispatch(self.recommender, job.method, job.params, debug=job.debug)
+            except Exception as e:
+                error = e
+
+            with self._condition:
+                self._running[job.queue] -= 1
+                if job.key is not None and self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+                self._condition.notify_all()
+
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+
+def _coalescing_key(method, params, debug):
+    if method not in COALESCED_METHODS:
+        return None
+    try:
+        return method, json.dumps(params, sort_keys=True), bool(debug)
+    except (TypeError, ValueError):
+        return None
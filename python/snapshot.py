@@ -0,0 +1,341 @@
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from lor_recommendation_ai import _timed_import
+
+SNAPSHOT_COLLECTIONS = ("students", "internships", "placements", "lortemplates")
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_VERSIONS_KEPT = 2
+POINTER_FILE = "CURRENT"
+
+# The format is row-oriented: each document is one BSON blob, addressed by an
+# offsets column and decoded when a query reaches it. Only the key columns
+# (and updatedAt) are NumPy arrays, sorted for lookups, so queries on them
+# never decode a document; analysis fields (cgpa, skills, ...) are read from
+# the decoded documents.
+KEY_COLUMNS = ("_id", "studentId")
+
+
+def create_snapshot(db, path, collections=SNAPSHOT_COLLECTIONS, batch_size=1000):
+    """Dump collections from db into a new version of the snapshot at path
+
+    Each dump goes into its own version directory under path and is
+    published by atomically replacing the CURRENT pointer file, so readers
+    and crashes never leave path without a complete snapshot. The previous
+    version is kept for readers that opened it just before the switch.
+    """
+    np = _timed_import("numpy")
+    bson = _timed_import("bson")
+
+    os.makedirs(path, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f"v{time.strftime('%Y%m%dT%H%M%S')}-", dir=path)
+    version = os.path.basename(tmp_path)
+    os.chmod(tmp_path, 0o755)  # mkdtemp makes it private to this user
+
+    manifest = {"format": SNAPSHOT_FORMAT, "createdAt": datetime.datetime.utcnow().isoformat() + "Z",
+                "collections": {}}
+    for name in collections:
+        started = time.perf_counter()
+        directory = os.path.join(tmp_path, name)
+        os.makedirs(directory)
+
+        keys = {column: [] for column in KEY_COLUMNS}
+        updated_at = []
+        offsets = [0]
+        with open(os.path.join(directory, "documents.bson"), "wb") as blob:
+            for document in db[name].find().batch_size(batch_size):
+                data = bson.encode(document)
+                blob.write(data)
+                offsets.append(offsets[-1] + len(data))
+                for column in KEY_COLUMNS:
+                    keys[column].append(_key(document.get(column)))
+                updated_at.append(document.get("updatedAt") if isinstance(document.get("updatedAt"), datetime.datetime)
+                                  else None)
+
+        np.save(os.path.join(directory, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        for column, values in keys.items():
+            array = np.asarray(values, dtype=np.bytes_) if values else np.zeros(0, dtype="S1")
+            order = np.argsort(array, kind="stable")
+            np.save(os.path.join(directory, f"{column}.npy"), array)
+            np.save(os.path.join(directory, f"{column}.order.npy"), order)
+            np.save(os.path.join(directory, f"{column}.sorted.npy"), array[order])
+        np.save(os.path.join(directory, "updatedAt.npy"),
+                np.asarray([np.datetime64(v, "ms") if v else np.datetime64("NaT", "ms") for v in updated_at],
+                           dtype="datetime64[ms]"))
+
+        manifest["collections"][name] = {"documents": len(offsets) - 1, "bytes": offsets[-1],
+                                         "seconds": round(time.perf_counter() - started, 3)}
+
+    with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    pointer_tmp = os.path.join(path, f"{POINTER_FILE}.tmp-{os.getpid()}")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(path, POINTER_FILE))
+    _prune_versions(path, keep=version)
+    return dict(manifest, path=tmp_path)
+
+
+def _prune_versions(path, keep):
+    """Remove all but the newest SNAPSHOT_VERSIONS_KEPT versions (and files of the unversioned layout)"""
+    entries = [name for name in os.listdir(path) if name != POINTER_FILE and name != keep
+               and not name.startswith(f"{POINTER_FILE}.tmp-")]
+    versions = sorted((name for name in entries if name.startswith("v") and
+                       os.path.exists(os.path.join(path, name, "manifest.json"))),
+                      key=lambda name: os.path.getmtime(os.path.join(path, name)), reverse=True)
+    kept = set(versions[:SNAPSHOT_VERSIONS_KEPT - 1])
+    for name in entries:
+        # A version without a manifest may still be being written by another process
+        if name in kept or (name.startswith("v") and name not in versions):
+            continue
+        target = os.path.join(path, name)
+        if os.path.isdir(target):
+            shutil.rmtree(target, ignore_errors=True)
+        else:
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+
+
+def _current_version(path):
+    """Directory of the snapshot version CURRENT points at (path itself for the unversioned layout)"""
+    try:
+        with open(os.path.join(path, POINTER_FILE), encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return path
+
+
+class SnapshotDatabase:
+    """Read-only, memory-mapped stand-in for a pymongo Database
+
+    Supports the queries the recommender issues: equality and $in on any
+    field ($in on _id/studentId uses the sorted key columns), $gt/$gte/$lt/$lte
+    on updatedAt, projections, find_one and batch_size/explain on cursors.
+    """
+
+    def __init__(self, path):
+        # Resolved once, so a snapshot published while this one is open is not mixed in
+        root, path = path, _current_version(path)
+        manifest_path = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise RuntimeError(f"No snapshot found at {root}; create one with 'snapshot {root}'")
+        with open(manifest_path, encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise RuntimeError(f"Snapshot at {path} has format {self.manifest.get('format')}, expected {SNAPSHOT_FORMAT}")
+        self.path = path
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = SnapshotCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class SnapshotCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._columns = None
+
+    def _load(self):
+        if self._columns is not None:
+            return self._columns
+        np = _timed_import("numpy")
+
+        directory = os.path.join(self.database.path, self.name)
+        if not os.path.isdir(directory):
+            print(f"Warning: snapshot has no {self.name} collection", file=sys.stderr)
+            columns = {"offsets": np.zeros(1, dtype=np.int64), "blob": np.zeros(0, dtype=np.uint8),
+                       "updatedAt": np.zeros(0, dtype="datetime64[ms]")}
+            for column in KEY_COLUMNS:
+                for suffix in ("", ".order", ".sorted"):
+                    columns[column + suffix] = np.zeros(0, dtype="S1")
+        else:
+            def mapped(name):
+                path = os.path.join(directory, f"{name}.npy")
+                try:
+                    return np.load(path, mmap_mode="r")
+                except ValueError:
+                    # Empty arrays cannot be memory-mapped
+                    return np.load(path)
+
+            columns = {"offsets": mapped("offsets"), "updatedAt": mapped("updatedAt")}
+            for column in KEY_COLUMNS:
+                for suffix in ("", ".order", ".sorted"):
+                    columns[column + suffix] = mapped(column + suffix)
+            size = os.path.getsize(os.path.join(directory, "documents.bson"))
+            columns["blob"] = (np.memmap(os.path.join(directory, "documents.bson"), dtype=np.uint8, mode="r")
+                               if size else np.zeros(0, dtype=np.uint8))
+        self._columns = columns
+        return columns
+
+    def __len__(self):
+        return len(self._load()["offsets"]) - 1
+
+    def _document(self, row):
+        bson = _timed_import("bson")
+        columns = self._load()
+        start, end = columns["offsets"][row], columns["offsets"][row + 1]
+        return bson.decode(memoryview(columns["blob"][start:end]))
+
+    # ------------------------------------------------------------------
+    # Query evaluation
+
+    def _rows(self, query):
+        """Row numbers (ascending) matching query, and any conditions left to check per document"""
+        np = _timed_import("numpy")
+        columns = self._load()
+
+        rows = None
+        remaining = {}
+        for field, condition in (query or {}).items():
+            if field in KEY_COLUMNS and (not isinstance(condition, dict) or set(condition) == {"$in"}):
+                values = condition["$in"] if isinstance(condition, dict) else [condition]
+                matched = self._key_rows(field, values)
+            elif field == "updatedAt" and isinstance(condition, dict) and set(condition) <= {"$gt", "$gte", "$lt", "$lte"}:
+                matched = self._range_rows(condition)
+            else:
+                remaining[field] = condition
+                continue
+            rows = matched if rows is None else np.intersect1d(rows, matched)
+
+        if rows is None:
+            rows = np.arange(len(columns["offsets"]) - 1)
+        return rows, remaining
+
+    def _key_rows(self, field, values):
+        np = _timed_import("numpy")
+        columns = self._load()
+        ordered = columns[f"{field}.sorted"]
+        if not len(ordered):
+            return np.zeros(0, dtype=np.int64)
+
+        wanted = np.asarray([_key(v) for v in values], dtype=np.bytes_)
+        starts = np.searchsorted(ordered, wanted, "left")
+        ends = np.searchsorted(ordered, wanted, "right")
+        found = [columns[f"{field}.order"][s:e] for s, e in zip(starts, ends) if e > s]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def _range_rows(self, condition):
+        np = _timed_import("numpy")
+        stamps = self._load()["updatedAt"]
+        keep = ~np.isnat(stamps)
+        for operator, value in condition.items():
+            bound = np.datetime64(value, "ms")
+            keep &= {"$gt": stamps > bound, "$gte": stamps >= bound,
+                     "$lt": stamps < bound, "$lte": stamps <= bound}[operator]
+        return np.flatnonzero(keep)
+
+    def find(self, query=None, projection=None):
+        return SnapshotCursor(self, query or {}, projection)
+
+    def find_one(self, query=None, projection=None):
+        for document in self.find(query, projection):
+            return document
+        return None
+
+    def count_documents(self, query):
+        return sum(1 for _ in self.find(query, {"_id": 1}))
+
+    # ------------------------------------------------------------------
+    # Index and change-stream calls the recommender makes on startup
+
+    def index_information(self):
+        # Key columns are sorted, which serves the same lookups an index would
+        return {f"{column}_1": {"key": [(column, 1)]} for column in (*KEY_COLUMNS, "updatedAt")}
+
+    def create_index(self, keys, **kwargs):
+        return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+    def watch(self, *args, **kwargs):
+        raise RuntimeError("snapshots are read-only and have no change stream")
+
+    def __getattr__(self, name):
+        if name in ("insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one",
+                    "delete_many", "bulk_write", "drop"):
+            raise RuntimeError(f"snapshot collection {self.name} is read-only ({name})")
+        raise AttributeError(name)
+
+
+class SnapshotCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+
+    def batch_size(self, size):
+        return self
+
+    def __iter__(self):
+        rows, remaining = self.collection._rows(self.query)
+        for row in rows:
+            document = self.collection._document(int(row))
+            if remaining and not all(_matches(document.get(field), condition)
+                                     for field, condition in remaining.items()):
+                continue
+            yield _project(document, self.projection)
+
+    def explain(self):
+        _, remaining = self.collection._rows(self.query)
+        stage = "SNAPSHOT_SCAN" if remaining or not self.query else "SNAPSHOT_KEY_LOOKUP"
+        return {"queryPlanner": {"winningPlan": {"stage": stage}}, "executionStats": {}}
+
+
+def _key(value):
+    # Keys compare as strings so ObjectId and string ids meet in one column
+    return b"" if value is None else str(value).encode("utf-8")
+
+
+def _matches(value, condition):
+    if isinstance(condition, dict):
+        unsupported = set(condition) - {"$in", "$ne", "$exists"}
+        if unsupported:
+            raise ValueError(f"Unsupported snapshot query operator(s): {', '.join(sorted(unsupported))}")
+        if "$in" in condition and not any(_matches(value, v) for v in condition["$in"]):
+            return False
+        if "$ne" in condition and _matches(value, condition["$ne"]):
+            return False
+        if "$exists" in condition and (value is not None) != bool(condition["$exists"]):
+            return False
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value == condition
+
+
+def _project(document, projection):
+    if not projection:
+        return document
+    included = {field for field, flag in projection.items() if flag}
+    if not included:
+        return {k: v for k, v in document.items() if k not in projection}
+    if projection.get("_id", 1):
+        included.add("_id")
+    return {k: v for k, v in document.items() if k in included}
+
+
+def snapshot_main(argv):
+    import argparse
+    from lor_recommendation_ai import get_db
+
+    parser = argparse.ArgumentParser(prog="lor_recommendation_ai.py snapshot",
+                                     description="Dump the collections the recommender reads to a memory-mappable snapshot")
+    parser.add_argument("path", help="Snapshot directory (a new version is added and made current)")
+    parser.add_argument("--collections", nargs="+", default=list(SNAPSHOT_COLLECTIONS))
+    args = parser.parse_args(argv)
+
+    print(json.dumps(create_snapshot(get_db(), args.path, args.collections), indent=2))
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+from lor_recommendation_ai import CACHE_DIR, _timed_import, get_nlp
+
+PIPE_BATCH_SIZE = 64
+
+
+class TemplateEmbeddings:
+    """L2-normalised spaCy document vectors for templates, persisted by content hash"""
+
+    def __init__(self, cache_dir=CACHE_DIR, model_name="en_core_web_md"):
+        self.cache_path = os.path.join(cache_dir, f"template_vectors-{model_name}.npz")
+        self._vectors = None     # content hash -> vector
+        self._matrix = None
+        self._matrix_for = None  # template list the matrix was built for
+        self._lock = threading.Lock()
+
+    def matrix(self, templates):
+        """n x d matrix of normalised vectors, row-aligned with templates"""
+        np = _timed_import("numpy")
+
+        with self._lock:
+            if self._matrix_for is templates:
+                return self._matrix
+
+            vectors = self._load_cache()
+            hashes = [_content_hash(t) for t in templates]
+            missing = {h: t for h, t in zip(hashes, templates) if h not in vectors}
+            if missing:
+                texts = [str(t.get("content", "")) for t in missing.values()]
+                for content_hash, vector in zip(missing, self._embed_many(texts)):
+                    vectors[content_hash] = vector
+                self._save_cache()
+
+            if hashes:
+                self._matrix = np.vstack([vectors[h] for h in hashes])
+            else:
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+            self._matrix_for = templates
+            return self._matrix
+
+    def embed(self, text):
+        return self._embed_many([text])[0]
+
+    def _embed_many(self, texts):
+        np = _timed_import("numpy")
+        nlp = get_nlp()
+
+        # Every pipeline component is skipped: document vectors only need the
+        # tokenizer and the static word vectors shipped with en_core_web_md
+        vectors = []
+        for doc in nlp.pipe(texts, disable=nlp.pipe_names, batch_size=PIPE_BATCH_SIZE):
+            vector = np.asarray(doc.vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vectors.append(vector / norm if norm else vector)
+        return vectors
+
+    def _load_cache(self):
+        if self._vectors is not None:
+            return self._vectors
+        np = _timed_import("numpy")
+
+        self._vectors = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with np.load(self.cache_path) as data:
+                    self._vectors = dict(zip(data["hashes"].tolist(), data["vectors"]))
+            except Exception as e:
+                print(f"Warning: ignoring unreadable embedding cache {self.cache_path} ({e})", file=sys.stderr)
+        return self._vectors
+
+    def _save_cache(self):
+        np = _timed_import("numpy")
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        hashes = list(self._vectors)
+        # A unique temp file per writer, replaced atomically, so neither a
+        # concurrent reader nor another process saving at the same time sees
+        # a half-written file
+        fd, tmp_path = tempfile.mkstemp(prefix=".embeddings-", suffix=".npz", dir=os.path.dirname(self.cache_path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, hashes=np.asarray(hashes), vectors=np.vstack([self._vectors[h] for h in hashes]))
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _content_hash(template):
+    return hashlib.sha256(str(template.get("content", "")).encode("utf-8")).hexdigest()
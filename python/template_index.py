@@ -0,0 +1,508 @@
+import json
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+
+from lor_recommendation_ai import CACHE_DIR, _timed_import, _version_hash
+from metrics import METRICS
+
+# Re-poll the collection for changes at most this often (seconds)
+DEFAULT_POLL_INTERVAL = 30.0
+
+# Refit the vocabulary once this share of the index has changed since the last fit
+DEFAULT_DRIFT_THRESHOLD = 0.2
+
+# Fitted vocabulary/IDF/matrix are persisted here and memory-mapped on start
+# (set LOR_TEMPLATE_ARTIFACT_DIR to an empty string to disable)
+DEFAULT_ARTIFACT_DIR = os.getenv("LOR_TEMPLATE_ARTIFACT_DIR", os.path.join(CACHE_DIR, "template_index"))
+ARTIFACT_FORMAT = 2
+ARTIFACT_VERSIONS_KEPT = 3
+
+
+class TemplateIndex:
+    """TF-IDF index over the lortemplates collection, kept current incrementally"""
+
+    def __init__(self, collection, poll_interval=DEFAULT_POLL_INTERVAL, drift_threshold=DEFAULT_DRIFT_THRESHOLD,
+                 artifact_dir=DEFAULT_ARTIFACT_DIR):
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.drift_threshold = drift_threshold
+        self.artifact_dir = artifact_dir
+
+        self.vectorizer = None
+        self._docs = {}       # template _id -> template document
+        self._order = []      # template _ids in matrix row order
+        self._matrix = None   # last fitted/rebuilt matrix (may be memory-mapped)
+        self._base_rows = {}  # template _id -> its row in self._matrix
+        self._rows = {}       # template _id -> 1 x vocabulary row re-vectorized since then
+        self._postings = None   # column-major copy of the matrix: term -> (rows, weights)
+        self._templates = None
+        self._facets = {}       # template field -> value -> rows, for pre-filters
+        self._dirty = False
+
+        # Drift bookkeeping since the last full fit
+        self._fitted_rows = 0
+        self._changed_rows = 0
+        self._new_tokens = 0
+        self._oov_tokens = 0
+
+        # Bumped on every change, so cached results can key on it
+        self.version = 0
+
+        self._last_synced = None
+        self._last_polled = 0.0
+        self._loaded = False
+        self._lock = threading.RLock()
+        self._watch_thread = None
+
+    # ------------------------------------------------------------------
+    # Loading and refitting
+
+    def ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self.load()
+
+    @METRICS.timed("template_load")
+    def load(self):
+        """Load the index, memory-mapping a persisted artifact when it is current
+
+        Falls back to reading the whole collection and fitting the vocabulary
+        from scratch, then persists the result for the next process.
+        """
+        with self._lock:
+            fingerprint = None
+            if self.artifact_dir:
+                fingerprint = self.collection_fingerprint()
+                if self._load_artifact(fingerprint):
+                    return
+
+            self._set_templates(list(self.collection.find()))
+            if not self._order:
+                print("Warning: No templates found in database", file=sys.stderr)
+            self._refit()
+
+            if self.artifact_dir and self._order:
+                self.save_artifact(fingerprint)
+
+    def _set_templates(self, templates):
+        self._docs = {t["_id"]: t for t in templates}
+        self._order = [t["_id"] for t in templates]
+        self._templates = None
+        self.version += 1
+        self._facets = {}
+        self._last_synced = max((t["updatedAt"] for t in templates if t.get("updatedAt")), default=None)
+        self._last_polled = time.monotonic()
+        self._loaded = True
+
+    def _refit(self):
+        TfidfVectorizer = _timed_import("sklearn.feature_extraction.text").TfidfVectorizer
+        self.vectorizer = TfidfVectorizer(stop_words='english')
+
+        matrix = None
+        if self._order:
+            template_texts = [_template_text(self._docs[i]) for i in self._order]
+            matrix = self.vectorizer.fit_transform(template_texts)
+        self._set_matrix(matrix)
+
+        self._fitted_rows = len(self._order)
+        self._changed_rows = 0
+        self._new_tokens = 0
+        self._oov_tokens = 0
+
+    def _set_matrix(self, matrix):
+        self._matrix = matrix
+        self._base_rows = {template_id: row for row, template_id in enumerate(self._order)}
+        self._rows = {}
+        self._postings = None
+        self._dirty = False
+
+    def drift(self):
+        """Share of the index that no longer matches the fitted vocabulary"""
+        if not self._fitted_rows:
+            return 1.0 if self._order else 0.0
+        changed = self._changed_rows / self._fitted_rows
+        oov = self._oov_tokens / self._new_tokens if self._new_tokens else 0.0
+        return max(changed, oov)
+
+    # ------------------------------------------------------------------
+    # Incremental maintenance
+
+    def upsert(self, template):
+        """Add a new template or replace an edited one"""
+        with self._lock:
+            template_id = template["_id"]
+            if template_id not in self._docs:
+                self._order.append(template_id)
+            self._docs[template_id] = template
+            self._templates = None
+            self.version += 1
+            self._facets = {}
+            self._changed_rows += 1
+
+            if self.vectorizer is None or not self._fitted_rows:
+                self._refit()
+                return
+
+            # Track how much of the new text the fitted vocabulary can't see
+            tokens = self.vectorizer.build_analyzer()(_template_text(template))
+            vocabulary = self.vectorizer.vocabulary_
+            self._new_tokens += len(tokens)
+            self._oov_tokens += sum(1 for token in tokens if token not in vocabulary)
+
+            if self.drift() > self.drift_threshold:
+                self._refit()
+            else:
+                self._rows[template_id] = self.vectorizer.transform([_template_text(template)])
+                self._dirty = True
+                self._postings = None
+
+    def remove(self, template_id):
+        """Drop a deleted template from the index"""
+        with self._lock:
+            if template_id not in self._docs:
+                return
+            del self._docs[template_id]
+            self._rows.pop(template_id, None)
+            self._base_rows.pop(template_id, None)
+            self._order.remove(template_id)
+            self._templates = None
+            self.version += 1
+            self._facets = {}
+            self._changed_rows += 1
+
+            if self.drift() > self.drift_threshold:
+                self._refit()
+            else:
+                self._dirty = True
+                self._postings = None
+
+    def refresh(self, force=False):
+        """Poll for templates changed or deleted since the last sync"""
+        with self._lock:
+            if not self._loaded:
+                self.load()
+                return
+            now = time.monotonic()
+            if not force and now - self._last_polled < self.poll_interval:
+                return
+            self._last_polled = now
+
+            if self._last_synced is not None:
+                for template in self.collection.find({"updatedAt": {"$gt": self._last_synced}}):
+                    self._apply_changed(template)
+
+            # Deletions (and inserts without timestamps) don't show up in an
+            # updatedAt query; diff the id set instead
+            live_ids = {t["_id"] for t in self.collection.find({}, {"_id": 1})}
+            for template_id in [i for i in self._order if i not in live_ids]:
+                self.remove(template_id)
+            added_ids = [i for i in live_ids if i not in self._docs]
+            if added_ids:
+                for template in self.collection.find({"_id": {"$in": added_ids}}):
+                    self._apply_changed(template)
+
+    def _apply_changed(self, template):
+        updated_at = template.get("updatedAt")
+        if updated_at and (self._last_synced is None or updated_at > self._last_synced):
+            self._last_synced = updated_at
+        self.upsert(template)
+
+    def watch(self):
+        """Follow a MongoDB change stream in a background thread (replica sets only)"""
+        if self._watch_thread is not None:
+            return self._watch_thread
+        self.ensure_loaded()
+
+        def follow():
+            try:
+                with self.collection.watch(full_document="updateLookup") as stream:
+                    for change in stream:
+                        operation = change["operationType"]
+                        if operation == "delete":
+                            self.remove(change["documentKey"]["_id"])
+                        elif change.get("fullDocument") is not None:
+                            self._apply_changed(change["fullDocument"])
+            except Exception as e:
+                # Standalone servers have no change streams; polling still covers us
+                print(f"Warning: template change stream stopped ({e}); falling back to polling", file=sys.stderr)
+
+        self._watch_thread = threading.Thread(target=follow, name="template-index-watch", daemon=True)
+        self._watch_thread.start()
+        return self._watch_thread
+
+    # ------------------------------------------------------------------
+    # Persisted artifact: vocabulary, IDF weights, CSR arrays and CSC postings on disk
+
+    def collection_fingerprint(self):
+        """Hash of every template's (_id, updatedAt), read with an id-only projection"""
+        return _version_hash(list(self.collection.find({}, {"_id": 1, "updatedAt": 1})))
+
+    def _artifact_path(self, fingerprint):
+        return os.path.join(self.artifact_dir, f"v{ARTIFACT_FORMAT}-{fingerprint}")
+
+    def build_artifact(self):
+        """Fit from the collection and persist the artifact (build step)"""
+        with self._lock:
+            self._set_templates(list(self.collection.find()))
+            self._refit()
+            fingerprint = self.collection_fingerprint()
+            return {"path": self.save_artifact(fingerprint), "fingerprint": fingerprint,
+                    "templates": len(self._order), "vocabulary": len(self.vectorizer.vocabulary_)}
+
+    def save_artifact(self, fingerprint):
+        np = _timed_import("numpy")
+
+        with self._lock:
+            path = self._artifact_path(fingerprint)
+            if os.path.isdir(path):
+                return path
+
+            matrix = self.matrix
+            terms = sorted(self.vectorizer.vocabulary_, key=self.vectorizer.vocabulary_.get)
+            tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            os.makedirs(tmp_path)
+            np.save(os.path.join(tmp_path, "data.npy"), matrix.data)
+            np.save(os.path.join(tmp_path, "indices.npy"), matrix.indices)
+            np.save(os.path.join(tmp_path, "indptr.npy"), matrix.indptr)
+            postings = matrix.tocsc()
+            postings.sort_indices()
+            np.save(os.path.join(tmp_path, "postings_data.npy"), postings.data)
+            np.save(os.path.join(tmp_path, "postings_indices.npy"), postings.indices)
+            np.save(os.path.join(tmp_path, "postings_indptr.npy"), postings.indptr)
+            np.save(os.path.join(tmp_path, "idf.npy"), self.vectorizer.idf_)
+            with open(os.path.join(tmp_path, "vocabulary.json"), "w", encoding="utf-8") as f:
+                json.dump(terms, f)
+            # Template documents are unpickled into each process (rendering
+            # needs them as dicts); only the numeric arrays are shared
+            with open(os.path.join(tmp_path, "templates.pkl"), "wb") as f:
+                pickle.dump([self._docs[i] for i in self._order], f)
+            with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump({"format": ARTIFACT_FORMAT, "fingerprint": fingerprint,
+                           "shape": list(matrix.shape), "createdAt": time.time()}, f)
+
+            # Publish atomically; if another worker got there first, keep theirs
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            self._prune_artifacts(keep=path)
+            return path
+
+    def _load_artifact(self, fingerprint):
+        np = _timed_import("numpy")
+        sparse = _timed_import("scipy.sparse")
+        TfidfVectorizer = _timed_import("sklearn.feature_extraction.text").TfidfVectorizer
+
+        path = self._artifact_path(fingerprint)
+        try:
+            with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("format") != ARTIFACT_FORMAT or manifest.get("fingerprint") != fingerprint:
+                return False
+            with open(os.path.join(path, "vocabulary.json"), encoding="utf-8") as f:
+                terms = json.load(f)
+            with open(os.path.join(path, "templates.pkl"), "rb") as f:
+                templates = pickle.load(f)
+
+            # Memory-mapped: worker processes share one page-cached copy
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                      for name in ("data", "indices", "indptr", "idf",
+                                   "postings_data", "postings_indices", "postings_indptr")}
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Warning: ignoring unreadable template index artifact {path} ({e})", file=sys.stderr)
+            return False
+
+        vectorizer = TfidfVectorizer(stop_words='english', vocabulary={term: i for i, term in enumerate(terms)})
+        vectorizer.idf_ = arrays["idf"]
+        shape = tuple(manifest["shape"])
+        matrix = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)
+        postings = sparse.csc_matrix((arrays["postings_data"], arrays["postings_indices"], arrays["postings_indptr"]),
+                                     shape=shape, copy=False)
+        postings.has_sorted_indices = True
+
+        self._set_templates(templates)
+        self.vectorizer = vectorizer
+        self._set_matrix(matrix)
+        self._postings = postings
+        self._fitted_rows = len(self._order)
+        self._changed_rows = 0
+        self._new_tokens = 0
+        self._oov_tokens = 0
+        return True
+
+    def _prune_artifacts(self, keep):
+        versions = [os.path.join(self.artifact_dir, name) for name in os.listdir(self.artifact_dir)
+                    if name.startswith(f"v{ARTIFACT_FORMAT}-") and ".tmp-" not in name]
+        versions.sort(key=os.path.getmtime, reverse=True)
+        for path in versions[ARTIFACT_VERSIONS_KEPT:]:
+            if path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    @property
+    def templates(self):
+        with self._lock:
+            if not self._loaded:
+                return None
+            if self._templates is None:
+                self._templates = [self._docs[i] for i in self._order]
+            return self._templates
+
+    @property
+    def matrix(self):
+        with self._lock:
+            if self._dirty:
+                self._rebuild_matrix()
+            return self._matrix
+
+    def _rebuild_matrix(self):
+        # Stack the re-vectorized rows under the current matrix once, then pick
+        # every row in index order with a single fancy-index operation
+        if not self._order:
+            matrix = None
+        else:
+            vstack = _timed_import("scipy.sparse").vstack
+            changed = list(self._rows)
+            blocks = ([self._matrix] if self._matrix is not None else []) + [self._rows[i] for i in changed]
+            stacked = vstack(blocks, format="csr")
+            offset = self._matrix.shape[0] if self._matrix is not None else 0
+            changed_rows = {template_id: offset + n for n, template_id in enumerate(changed)}
+            picks = [changed_rows[i] if i in changed_rows else self._base_rows[i] for i in self._order]
+            matrix = stacked[picks]
+        self._set_matrix(matrix)
+
+    def search(self, query_text, k=1, filters=None):
+        """Best k templates for a query as (template, score) pairs, best first
+
+        Scores are cosine similarities (rows and query are both L2-normalised
+        TF-IDF), computed by walking only the postings of the query's terms.
+        filters maps a template field to the value it must have (or a list of
+        accepted values) and narrows the candidates before any scoring.
+        """
+        np = _timed_import("numpy")
+
+        with self._lock:
+            templates = self.templates
+            if not templates:
+                return []
+            postings = self._get_postings()
+            vectorizer = self.vectorizer
+            allowed = self._filter_rows(filters) if filters else None
+
+        if allowed is not None and not len(allowed):
+            return []
+
+        with METRICS.stage("vectorize"):
+            query = vectorizer.transform([query_text])
+        with METRICS.stage("similarity"):
+            row_parts = []
+            score_parts = []
+            for term, weight in zip(query.indices, query.data):
+                start, end = postings.indptr[term], postings.indptr[term + 1]
+                row_parts.append(postings.indices[start:end])
+                score_parts.append(postings.data[start:end] * weight)
+
+            candidates = np.zeros(0, dtype=np.int64)
+            scores = np.zeros(0)
+            if row_parts:
+                rows = np.concatenate(row_parts)
+                contributions = np.concatenate(score_parts)
+                if allowed is not None:
+                    keep = np.isin(rows, allowed)
+                    rows = rows[keep]
+                    contributions = contributions[keep]
+                candidates, inverse = np.unique(rows, return_inverse=True)
+                scores = np.bincount(inverse, weights=contributions)
+
+            # Templates sharing no term with the query score 0; top up from the
+            # earliest rows so ties break the way argmax over all rows would
+            if len(candidates) < k:
+                pool = allowed if allowed is not None else np.arange(len(templates))
+                pool = pool[:k + len(candidates)]
+                zero_rows = pool[~np.isin(pool, candidates)][:k - len(candidates)]
+                candidates = np.concatenate([candidates, zero_rows])
+                scores = np.concatenate([scores, np.zeros(len(zero_rows))])
+
+        best = np.lexsort((candidates, -scores))[:k]
+        return [(templates[candidates[i]], float(scores[i])) for i in best]
+
+    def similarities(self, query_text, filters=None):
+        """Dense TF-IDF scores for every template, taken under one lock
+
+        Returns (templates, scores, allowed) where allowed holds the rows that
+        pass filters (None when unfiltered).
+        """
+        with self._lock:
+            templates = self.templates
+            if not templates:
+                return templates, None, None
+            matrix = self.matrix
+            vectorizer = self.vectorizer
+            allowed = self._filter_rows(filters) if filters else None
+
+        with METRICS.stage("vectorize"):
+            query = vectorizer.transform([query_text])
+        with METRICS.stage("similarity"):
+            scores = (matrix @ query.T).toarray().ravel()
+        return templates, scores, allowed
+
+    def _get_postings(self):
+        # Inverted index: a CSC matrix stores each term's (row, weight) postings contiguously.
+        # A loaded artifact brings memory-mapped postings; only incremental changes rebuild them here
+        matrix = self.matrix  # rebuilds pending incremental changes (and drops old postings)
+        if self._postings is None:
+            self._postings = matrix.tocsc()
+            self._postings.sort_indices()
+        return self._postings
+
+    def _filter_rows(self, filters):
+        np = _timed_import("numpy")
+
+        rows = None
+        for field, wanted in filters.items():
+            facet = self._facets.get(field)
+            if facet is None:
+                facet = {}
+                for row, template in enumerate(self.templates):
+                    for value in _facet_values(template.get(field)):
+                        facet.setdefault(value, []).append(row)
+                facet = {value: np.asarray(matches) for value, matches in facet.items()}
+                self._facets[field] = facet
+
+            accepted = wanted if isinstance(wanted, list) else [wanted]
+            matched = np.zeros(0, dtype=np.int64)
+            for value in accepted:
+                matched = np.union1d(matched, facet.get(_facet_key(value), np.zeros(0, dtype=np.int64)))
+            rows = matched if rows is None else np.intersect1d(rows, matched)
+        return rows
+
+    def __len__(self):
+        return len(self._order)
+
+
+def _template_text(template):
+    return str(template.get("content", ""))
+
+
+def _facet_key(value):
+    # Compare string metadata case-insensitively
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def _facet_values(value):
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        # e.g. {"name": "Computer Engineering"}, as departments are stored
+        return [_facet_key(value["name"])] if "name" in value else []
+    if isinstance(value, list):
+        return [_facet_key(v) for v in value]
+    return [_facet_key(value)]
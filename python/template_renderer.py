@@ -0,0 +1,99 @@
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+# Placeholders generate_lor_content knows how to fill
+KNOWN_PLACEHOLDERS = ("name", "rollNo", "department", "cgpa", "university", "program",
+                      "purpose", "skills", "achievements", "internships", "strengths")
+
+# Placeholders a usable letter template is expected to contain
+REQUIRED_PLACEHOLDERS = ("name",)
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{(.*?)\}\}")
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class CompiledTemplate:
+    """Template content split once into literal chunks and placeholder slots"""
+
+    def __init__(self, content):
+        self._parts = []   # literal strings, with None where a slot goes
+        self._slots = []   # (index into _parts, placeholder name)
+        self.unknown_placeholders = []
+
+        position = 0
+        literal = []
+        for match in PLACEHOLDER_PATTERN.finditer(content):
+            literal.append(content[position:match.start()])
+            name = match.group(1)
+            if name in KNOWN_PLACEHOLDERS:
+                self._parts.append("".join(literal))
+                literal = []
+                self._slots.append((len(self._parts), name))
+                self._parts.append(None)
+            else:
+                # Unknown placeholders are left in the letter untouched
+                literal.append(match.group(0))
+                if name not in self.unknown_placeholders:
+                    self.unknown_placeholders.append(name)
+            position = match.end()
+        literal.append(content[position:])
+        self._parts.append("".join(literal))
+
+        self.placeholders = frozenset(name for _, name in self._slots)
+        self.missing_placeholders = [p for p in REQUIRED_PLACEHOLDERS if p not in self.placeholders]
+
+    def uses(self, name):
+        return name in self.placeholders
+
+    def render(self, values):
+        """Fill every slot in a single pass; values maps placeholder name to text"""
+        parts = list(self._parts)
+        for index, name in self._slots:
+            parts[index] = values[name]
+        return "".join(parts)
+
+
+class TemplateRenderer:
+    """Cache of compiled templates keyed by template _id and version"""
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, template):
+        content = template.get("content", "")
+        # updatedAt changes on every edit; fall back to the content itself
+        version = template.get("updatedAt") or hash(content)
+        key = (str(template.get("_id")), version)
+
+        with self._lock:
+            compiled = self._compiled.get(key)
+            if compiled is not None:
+                self._compiled.move_to_end(key)
+                return compiled
+
+        compiled = CompiledTemplate(content)
+        if compiled.unknown_placeholders:
+            print(f"Warning: template {key[0]} has unknown placeholders: "
+                  f"{', '.join(compiled.unknown_placeholders)}", file=sys.stderr)
+
+        with self._lock:
+            self._compiled[key] = compiled
+            if len(self._compiled) > self.max_size:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def check(self, template):
+        """Compile-time report of unknown and missing placeholders for one template"""
+        compiled = self.compile(template)
+        return {
+            "templateId": str(template.get("_id")),
+            "title": template.get("title", ""),
+            "placeholders": sorted(compiled.placeholders),
+            "unknownPlaceholders": compiled.unknown_placeholders,
+            "missingPlaceholders": compiled.missing_placeholders
+        }
@@ -0,0 +1,39 @@
+from bson import ObjectId
+
+from lor_recommendation_ai import LORRecommendationAI
+
+
+def make_recommender(students, internships, placements, insights):
+    recommender = LORRecommendationAI(db={"lortemplates": None, "students": None, "internships": None,
+                                          "placements": None}, text_nlp=True)
+    recommender._fetch_cohort = lambda student_ids, object_ids: (
+        {s["_id"]: s for s in students}, internships, placements)
+    recommender._insights_many = lambda pairs: [insights[str(student["_id"])] for student, _ in pairs]
+    return recommender
+
+
+def test_vectorized_matches_scalar_with_insights():
+    lead_intern = {"roles": ["Team Lead Intern"], "organizations": [], "actionVerbs": []}
+    organiser = {"roles": [], "organizations": [], "actionVerbs": ["organize"]}
+    no_insight = {"roles": [], "organizations": [], "actionVerbs": []}
+    students = [
+        # Leadership role from an internship position, but no achievements
+        {"_id": ObjectId(), "name": "No Achievements", "skills": ["python"]},
+        # Leadership only visible to text understanding
+        {"_id": ObjectId(), "name": "Organiser", "cgpa": 8.5, "achievements": ["Organised the annual fest"]},
+        # Leadership from the keyword table alone
+        {"_id": ObjectId(), "name": "Captain", "achievements": ["Captain of the cricket team"]},
+        {"_id": ObjectId(), "name": "Plain", "skills": ["java", "sql", "react"], "achievements": ["Won a prize"]},
+    ]
+    ids = [str(s["_id"]) for s in students]
+    internships = {ids[0]: [{"studentId": ids[0], "position": "Team Lead Intern", "company": "Acme"}]}
+    placements = {ids[3]: [{"studentId": ids[3], "company": "Initech"}]}
+    insights = dict(zip(ids, [lead_intern, organiser, no_insight, no_insight]))
+
+    recommender = make_recommender(students, internships, placements, insights)
+    scalar = recommender.analyze_students(ids, vectorized=False)
+    vectorized = recommender.analyze_students(ids, vectorized=True)
+
+    assert vectorized == scalar
+    assert scalar[0]["strengths"] == ["practical"]
+    assert "leadership" in scalar[1]["strengths"]
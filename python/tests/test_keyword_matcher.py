@@ -0,0 +1,53 @@
+from keyword_matcher import KeywordMatcher, KeywordTables
+
+FIELDS = {
+    "data science": ["python", "r", "statistics", "machine learning", "data"],
+    "ai/ml": ["machine learning", "ai", "deep learning"],
+    "software engineering": ["java", "c++", "software"],
+    "cybersecurity": ["security", "network security"],
+}
+
+
+def test_word_keywords_match_whole_words_only():
+    matcher = KeywordMatcher(FIELDS)
+    assert matcher.matches("Research in R and Python") == {"r", "python"}
+    # "r" and "ai" inside other words, "java" inside "javascript"
+    assert matcher.matches("Wrote a JavaScript parser for rain data") == {"data"}
+    assert matcher.matches("Trained an AI-driven model") == {"ai"}
+    assert matcher.matches("C++, Java; software") == {"c++", "java", "software"}
+    assert matcher.matches("") == set()
+    assert not matcher.any("maintained a website")
+
+
+def test_prefix_keywords_match_stems_at_word_starts():
+    matcher = KeywordMatcher(["lead", "organiz", "manage"], prefix=True)
+    assert matcher.matches("Organized the fest and led a team") == {"organiz"}
+    assert matcher.matches("Leadership roles; managed volunteers") == {"lead", "manage"}
+    # A stem must start a word
+    assert matcher.matches("Mismanaged and reorganized") == set()
+
+
+def test_nested_keywords_are_credited_through_implied():
+    matcher = KeywordMatcher(FIELDS)
+    assert matcher.implied["network security"] == {"security"}
+    assert matcher.implied["machine learning"] == set()
+    # The longer keyword wins the match; the one it contains is still found
+    assert matcher.matches("Network security internship") == {"network security", "security"}
+
+    scores = matcher.score("machine learning and network security")
+    assert scores == {"data science": 1, "ai/ml": 1, "software engineering": 0, "cybersecurity": 2}
+
+
+def test_score_counts_distinct_keywords_with_weight():
+    matcher = KeywordMatcher(FIELDS)
+    scores = matcher.score("python python statistics", weight=2)
+    assert scores["data science"] == 4
+    matcher.score("java", scores=scores)
+    assert scores["software engineering"] == 1
+
+
+def test_tables_load_from_the_data_file():
+    tables = KeywordTables()
+    assert not tables.fields.prefix and tables.leadership.prefix
+    assert "web development" in tables.fields.groups
+    assert tables.leadership.any("Organized events") and tables.roles is not None
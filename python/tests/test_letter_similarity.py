@@ -0,0 +1,71 @@
+import numpy as np
+
+from letter_similarity import LetterIndex, _shingles
+
+LETTER = ("It is my pleasure to recommend Priya Sharma for graduate study in computer science. "
+          "During her four years in our department she consistently ranked among the top students "
+          "of her class, led the robotics club through two national competitions and completed an "
+          "internship at Acme Systems where she built a data pipeline used by the analytics team. "
+          "She is diligent, curious and generous with her time, and I recommend her without reservation.")
+NEAR_DUPLICATE = LETTER.replace("Priya Sharma", "Priya S. Sharma").replace("two national", "three national")
+UNRELATED = ("Rahul has worked in my laboratory on protein folding simulations for the past year. "
+             "His experiments were careful and his written reports clear, and he presented a poster "
+             "at the regional biology symposium that drew considerable interest from visiting faculty.")
+
+
+def jaccard(a, b, size):
+    a, b = _shingles(a, size), _shingles(b, size)
+    return len(a & b) / len(a | b)
+
+
+def test_signature_similarity_estimates_jaccard():
+    index = LetterIndex()
+    estimate = (index.signature(LETTER) == index.signature(NEAR_DUPLICATE)).mean()
+    assert abs(estimate - jaccard(LETTER, NEAR_DUPLICATE, index.shingle_size)) < 0.1
+    assert (index.signature(LETTER) == index.signature(UNRELATED)).mean() < 0.1
+
+
+def test_query_finds_near_duplicates_only():
+    index = LetterIndex(threshold=0.6)
+    index.add_many([("original", LETTER), ("unrelated", UNRELATED)])
+
+    matches = index.query(NEAR_DUPLICATE)
+    assert [m["key"] for m in matches] == ["original"]
+    assert matches[0]["similarity"] >= 0.6
+    assert index.query(LETTER, exclude="original") == []
+
+    index.remove("original")
+    assert index.query(NEAR_DUPLICATE) == []
+
+
+def test_clusters_join_near_duplicates_and_leave_singletons_out():
+    index = LetterIndex(threshold=0.6)
+    index.add_many([("a", LETTER), ("b", NEAR_DUPLICATE), ("c", UNRELATED)])
+    assert index.clusters() == [{"size": 2, "keys": ["a", "b"]}]
+
+
+def test_clusters_compare_every_pair_in_a_bucket():
+    # "1" ~ "2" and "2" ~ "3", but "1" and "3" are not similar and all three
+    # share only the first band: "3" is found through its pair with "2"
+    index = LetterIndex(threshold=0.8)
+    base = np.arange(index.num_perm, dtype=np.uint64)
+    positions = np.arange(index.rows, index.num_perm)
+    first, second = base.copy(), base.copy()
+    first[positions[0::4][:25]] += 10000
+    second[:] = first
+    second[positions[2::4][:25]] += 20000
+    for key, signature in (("1", base), ("2", first), ("3", second)):
+        index.add_signature(key, signature)
+
+    assert (base == second).mean() < index.threshold
+    assert index.clusters() == [{"size": 3, "keys": ["1", "2", "3"]}]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = LetterIndex(threshold=0.6)
+    index.add_many([("original", LETTER), ("unrelated", UNRELATED)])
+    index.save(str(tmp_path))
+
+    loaded = LetterIndex.load(str(tmp_path))
+    assert len(loaded) == 2 and not loaded.dirty
+    assert [m["key"] for m in loaded.query(NEAR_DUPLICATE)] == ["original"]
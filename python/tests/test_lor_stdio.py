@@ -0,0 +1,77 @@
+import io
+import json
+import threading
+from concurrent.futures import Future
+
+from lor_stdio import StdioServer
+
+
+class FakeRecommender:
+    def warm(self):
+        pass
+
+    def save_letter_index(self):
+        pass
+
+
+class ReversingScheduler:
+    """Holds every call, then completes them in the reverse of their submission order"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, method, params=None, queue=None, debug=False, block=False):
+        future = Future()
+        self.calls.append((future, method, params))
+        return future
+
+    def complete(self):
+        for future, method, params in reversed(self.calls):
+            if params == ["boom"]:
+                future.set_exception(RuntimeError("boom"))
+            else:
+                future.set_result({"method": method, "studentId": params[0]})
+
+
+def run_server(lines, max_in_flight=8):
+    scheduler = ReversingScheduler()
+
+    def stdin():
+        for line in lines:
+            yield json.dumps(line) + "\n"
+        # Every line has been handed over; finish the calls from another thread
+        threading.Thread(target=scheduler.complete).start()
+
+    stdout = io.StringIO()
+    StdioServer(FakeRecommender(), max_in_flight=max_in_flight, stdin=stdin(), stdout=stdout,
+                scheduler=scheduler).run()
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+
+def test_out_of_order_responses_carry_their_request_ids():
+    requests = [{"jsonrpc": "2.0", "id": n, "method": "analyze", "params": [f"s{n}"]} for n in range(5)]
+    requests.append({"jsonrpc": "2.0", "id": "fails", "method": "analyze", "params": ["boom"]})
+    responses = run_server(requests)
+
+    assert [r["id"] for r in responses] == ["fails", 4, 3, 2, 1, 0]
+    by_id = {r["id"]: r for r in responses}
+    for n in range(5):
+        assert by_id[n]["result"] == {"method": "analyze", "studentId": f"s{n}"}
+    assert by_id["fails"]["error"]["code"] == -32603
+
+
+def test_rejected_lines_are_answered_with_their_ids():
+    requests = [
+        {"jsonrpc": "2.0", "id": "a", "method": "analyze", "params": ["s1"]},
+        {"jsonrpc": "2.0", "id": "b", "method": "no_such_method"},
+        {"jsonrpc": "2.0", "id": "c", "method": "analyze", "params": {"unknown": 1}},
+        {"jsonrpc": "2.0", "id": "d", "method": "analyze", "params": ["s2"]},
+    ]
+    responses = run_server(requests)
+
+    by_id = {r["id"]: r for r in responses}
+    assert len(responses) == 4
+    assert by_id["b"]["error"]["code"] == -32601
+    assert by_id["c"]["error"]["code"] == -32602
+    assert by_id["a"]["result"]["studentId"] == "s1" and by_id["d"]["result"]["studentId"] == "s2"
+    assert [r["id"] for r in responses][-2:] == ["d", "a"]
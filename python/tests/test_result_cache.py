@@ -0,0 +1,85 @@
+import os
+
+import result_cache
+from result_cache import ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def use_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "time", clock.time)
+    return clock
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = use_clock(monkeypatch)
+    cache = ResultCache(ttl=10)
+    cache.put(("analyze", "s1"), {"strengths": []}, tag="s1")
+
+    clock.now += 9
+    assert cache.get(("analyze", "s1"), tag="s1") == {"strengths": []}
+    clock.now += 2
+    assert cache.get(("analyze", "s1"), tag="s1") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["size"] == 2
+
+
+def test_invalidate_by_tag_and_everything():
+    cache = ResultCache()
+    cache.put(("analyze", "s1"), 1, tag="s1")
+    cache.put(("generate", "s1"), 2, tag="s1")
+    cache.put(("analyze", "s2"), 3, tag="s2")
+
+    cache.invalidate("s1")
+    assert cache.get(("analyze", "s1"), tag="s1") is None
+    assert cache.get(("generate", "s1"), tag="s1") is None
+    assert cache.get(("analyze", "s2"), tag="s2") == 3
+
+    cache.invalidate()
+    assert cache.get(("analyze", "s2"), tag="s2") is None
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_disk_tier_survives_restart_and_is_bounded(tmp_path):
+    cache = ResultCache(max_entries=1, disk_dir=str(tmp_path), disk_max_entries=2)
+    for n in range(3):
+        cache.put(("analyze", f"s{n}"), n, tag=f"s{n}")
+        os.utime(os.path.join(str(tmp_path), cache._name(("analyze", f"s{n}"), f"s{n}")), (n, n))
+    assert len(os.listdir(str(tmp_path))) == 2
+    assert cache.stats()["diskEvictions"] == 1
+
+    restarted = ResultCache(max_entries=1, disk_dir=str(tmp_path), disk_max_entries=2)
+    assert restarted.get(("analyze", "s0"), tag="s0") is None
+    assert restarted.get(("analyze", "s2"), tag="s2") == 2
+    assert restarted.stats()["diskHits"] == 1
+
+
+def test_disk_invalidation_removes_only_the_tagged_files(tmp_path):
+    cache = ResultCache(disk_dir=str(tmp_path))
+    cache.put(("analyze", "s1"), 1, tag="s1")
+    cache.put(("analyze", "s2"), 2, tag="s2")
+
+    cache.invalidate("s1")
+    restarted = ResultCache(disk_dir=str(tmp_path))
+    assert restarted.get(("analyze", "s1"), tag="s1") is None
+    assert restarted.get(("analyze", "s2"), tag="s2") == 2
+    assert len(os.listdir(str(tmp_path))) == 1
@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+import scheduler
+from scheduler import Overloaded, Scheduler
+
+
+class FakeDispatch:
+    """Stands in for lor_recommendation_ai.dispatch; calls with params "gate" wait for release()"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self._release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, recommender, method, params=None, debug=False):
+        if params == "gate":
+            self.started.set()
+            self._release.wait(5)
+        with self._lock:
+            self.calls.append((method, params))
+        return {"method": method, "params": params}
+
+    def release(self):
+        self._release.set()
+
+
+@pytest.fixture
+def fake_dispatch(monkeypatch):
+    fake = FakeDispatch()
+    monkeypatch.setattr(scheduler, "dispatch", fake)
+    yield fake
+    fake.release()
+
+
+def occupy(tasks, fake_dispatch, queue="interactive"):
+    """Start a call that holds the only worker until fake_dispatch.release()"""
+    future = tasks.submit("analyze", "gate", queue)
+    assert fake_dispatch.started.wait(5)
+    return future
+
+
+def test_identical_calls_share_one_execution(fake_dispatch):
+    tasks = Scheduler(recommender=None, workers=1)
+    gate = occupy(tasks, fake_dispatch)
+
+    first = tasks.submit("analyze", ["s1"])
+    second = tasks.submit("analyze", ["s1"])
+    other = tasks.submit("analyze", ["s2"])
+    uncoalesced = [tasks.submit("invalidate_cache", ["s1"]) for _ in range(2)]
+    assert first is second and other is not first
+    assert uncoalesced[0] is not uncoalesced[1]
+
+    fake_dispatch.release()
+    assert first.result(5) == second.result(5) == {"method": "analyze", "params": ["s1"]}
+    for future in [gate, other] + uncoalesced:
+        future.result(5)
+    assert fake_dispatch.calls.count(("analyze", ["s1"])) == 1
+    assert fake_dispatch.calls.count(("invalidate_cache", ["s1"])) == 2
+    assert tasks.stats()["inFlight"] == 0
+
+
+def test_interactive_work_starts_before_queued_bulk_work(fake_dispatch):
+    tasks = Scheduler(recommender=None, workers=1)
+    gate = occupy(tasks, fake_dispatch)
+
+    bulk = [tasks.submit("analyze_batch", [[f"b{i}"]]) for i in range(2)]
+    interactive = tasks.submit("analyze", ["i1"])
+    assert tasks.stats()["queues"]["bulk"]["pending"] == 2
+
+    fake_dispatch.release()
+    for future in [gate, interactive] + bulk:
+        future.result(5)
+    assert fake_dispatch.calls[1:] == [("analyze", ["i1"]), ("analyze_batch", [["b0"]]),
+                                       ("analyze_batch", [["b1"]])]
+
+
+def test_interactive_caller_promotes_identical_queued_bulk_call(fake_dispatch):
+    tasks = Scheduler(recommender=None, workers=1)
+    gate = occupy(tasks, fake_dispatch)
+
+    other_bulk = tasks.submit("analyze_batch", [["b0"]])
+    queued = tasks.submit("analyze_batch", [["b1"]])
+    promoted = tasks.submit("analyze_batch", [["b1"]], "interactive")
+    assert promoted is queued
+
+    fake_dispatch.release()
+    for future in (gate, other_bulk, promoted):
+        future.result(5)
+    assert fake_dispatch.calls[1:] == [("analyze_batch", [["b1"]]), ("analyze_batch", [["b0"]])]
+
+
+def test_full_queue_rejects_with_overloaded(fake_dispatch):
+    tasks = Scheduler(recommender=None, workers=1, max_pending={"interactive": 1})
+    gate = occupy(tasks, fake_dispatch)
+
+    waiting = tasks.submit("analyze", ["s1"])
+    with pytest.raises(Overloaded):
+        tasks.submit("analyze", ["s2"])
+    # Joining an identical call already queued takes no new slot
+    assert tasks.submit("analyze", ["s1"]) is waiting
+    # The bulk queue has its own limit
+    bulk = tasks.submit("analyze_batch", [["b0"]])
+
+    fake_dispatch.release()
+    for future in (gate, waiting, bulk):
+        future.result(5)
+    assert tasks.submit("analyze", ["s2"]).result(5) == {"method": "analyze", "params": ["s2"]}
+
+
+def test_unknown_queue_is_rejected(fake_dispatch):
+    tasks = Scheduler(recommender=None, workers=1)
+    with pytest.raises(ValueError):
+        tasks.submit("analyze", ["s1"], "urgent")
@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+
+from data_access import INTERNSHIP_PROJECTION, STUDENT_PROJECTION, student_filter
+from lor_recommendation_ai import LORRecommendationAI
+from snapshot import SNAPSHOT_COLLECTIONS, SnapshotDatabase, create_snapshot
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def make_database():
+    db = mongomock.MongoClient().get_database("lor_snapshot_test")
+    stamp = datetime.datetime(2024, 1, 1)
+    students = [
+        {"name": "Asha", "rollNo": "CS01", "cgpa": 9.1, "skills": ["python", "machine learning"],
+         "achievements": ["Captain of the cricket team"], "updatedAt": stamp},
+        {"name": "Ben", "skills": ["java"], "achievements": [], "updatedAt": stamp + datetime.timedelta(days=2)},
+        {"name": "Chen", "department": {"name": "Electronics"}},
+    ]
+    ids = db.students.insert_many(students).inserted_ids
+    db.internships.insert_many([
+        # The Node models store studentId as an ObjectId, older documents as a string
+        {"studentId": ids[0], "company": "Acme", "position": "Team Lead Intern", "updatedAt": stamp},
+        {"studentId": str(ids[1]), "company": "Initech", "position": "Developer"},
+    ])
+    db.placements.insert_one({"studentId": ids[0], "company": "Globex", "updatedAt": stamp})
+    db.lortemplates.insert_one({"name": "Graduate", "content": "{student_name} is ready.", "updatedAt": stamp})
+    return db, [str(i) for i in ids]
+
+
+def test_snapshot_answers_queries_like_the_live_database(tmp_path):
+    live, ids = make_database()
+    create_snapshot(live, str(tmp_path / "snapshot"))
+    snapshot = SnapshotDatabase(str(tmp_path / "snapshot"))
+
+    for name in SNAPSHOT_COLLECTIONS:
+        assert list(snapshot[name].find()) == list(live[name].find())
+
+    queries = [
+        ("students", {"_id": live.students.find_one({"name": "Asha"})["_id"]}, STUDENT_PROJECTION),
+        ("internships", student_filter(ids[0]), INTERNSHIP_PROJECTION),
+        ("internships", student_filter(ids[1]), INTERNSHIP_PROJECTION),
+        ("students", {"updatedAt": {"$gt": datetime.datetime(2024, 1, 2)}}, {"name": 1}),
+        ("students", {"name": {"$in": ["Ben", "Chen"]}}, None),
+    ]
+    for name, query, projection in queries:
+        assert list(snapshot[name].find(query, projection)) == list(live[name].find(query, projection))
+
+
+def test_recommender_analysis_matches_between_snapshot_and_live(tmp_path):
+    live, ids = make_database()
+    create_snapshot(live, str(tmp_path / "snapshot"))
+
+    from_live = LORRecommendationAI(db=live)
+    from_snapshot = LORRecommendationAI(db=SnapshotDatabase(str(tmp_path / "snapshot")))
+    for student_id in ids:
+        assert from_snapshot.analyze_student(student_id) == from_live.analyze_student(student_id)
+    assert from_snapshot.analyze_students(ids) == from_live.analyze_students(ids)
+
+
+def test_new_snapshot_replaces_the_current_one(tmp_path):
+    live, _ = make_database()
+    path = str(tmp_path / "snapshot")
+    create_snapshot(live, path)
+    opened = SnapshotDatabase(path)
+
+    live.students.insert_one({"name": "Dev"})
+    create_snapshot(live, path)
+    assert len(SnapshotDatabase(path).students) == 4
+    # A database opened before the switch keeps reading its own version
+    assert len(opened.students) == 3
@@ -0,0 +1,44 @@
+from template_index import TemplateIndex
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, *args, **kwargs):
+        return list(self.documents)
+
+
+def make_index(count=21):
+    templates = [{"_id": i, "name": f"template number {i}", "content": f"topic{i} strong recommendation letter"}
+                 for i in range(count)]
+    index = TemplateIndex(FakeCollection(templates), drift_threshold=0.5, artifact_dir=None)
+    index.load()
+    return index
+
+
+def best_name(index, query):
+    (template, _), = index.search(query, k=1)
+    return template["name"]
+
+
+def test_search_after_incremental_changes_below_drift_threshold():
+    index = make_index()
+    assert best_name(index, "topic5") == "template number 5"  # builds the postings
+
+    # Delete: later rows shift up
+    index.remove(2)
+    assert index.drift() <= index.drift_threshold
+    assert best_name(index, "topic5") == "template number 5"
+    assert best_name(index, "topic20") == "template number 20"
+
+    # Add: a new template using only fitted vocabulary
+    index.upsert({"_id": 100, "name": "template number 100", "content": "topic4 topic4"})
+    assert best_name(index, "topic4") == "template number 100"
+
+    # Edit: an existing template's text changes
+    index.upsert({"_id": 7, "name": "template number 7", "content": "topic12"})
+    assert best_name(index, "topic12") == "template number 7"
+
+    assert index.drift() <= index.drift_threshold
+    assert len(index) == 21
@@ -0,0 +1,30 @@
+from template_renderer import CompiledTemplate, TemplateRenderer
+
+CONTENT = "Dear committee, {{name}} ({{rollNo}}) is {{adjective}}. {{name}} has {{gpa}} and {{adjective}} work."
+
+
+def test_unknown_placeholders_are_reported_once_in_order_and_left_in_the_letter():
+    compiled = CompiledTemplate(CONTENT)
+    assert compiled.unknown_placeholders == ["adjective", "gpa"]
+    assert compiled.placeholders == {"name", "rollNo"}
+    assert compiled.render({"name": "Asha", "rollNo": "CS01"}) == \
+        "Dear committee, Asha (CS01) is {{adjective}}. Asha has {{gpa}} and {{adjective}} work."
+
+
+def test_check_reports_unknown_and_missing_placeholders(capsys):
+    renderer = TemplateRenderer()
+    report = renderer.check({"_id": "t1", "title": "Graduate", "content": "To whom: {{Name}} studied {{program}}."})
+    assert report == {"templateId": "t1", "title": "Graduate", "placeholders": ["program"],
+                      "unknownPlaceholders": ["Name"], "missingPlaceholders": ["name"]}
+    assert "template t1 has unknown placeholders: Name" in capsys.readouterr().err
+
+
+def test_clean_template_reports_nothing_and_warns_once_per_version(capsys):
+    renderer = TemplateRenderer()
+    clean = renderer.check({"_id": "t2", "content": "{{name}} applied to {{university}}."})
+    assert clean["unknownPlaceholders"] == [] and clean["missingPlaceholders"] == []
+
+    template = {"_id": "t3", "content": "{{name}} {{typo}}", "updatedAt": 1}
+    renderer.compile(template)
+    renderer.compile(template)
+    assert capsys.readouterr().err.count("unknown placeholders: typo") == 1
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from lor_recommendation_ai import CACHE_DIR, get_nlp
+from metrics import METRICS
+
+# Components the extraction reads: POS tags and lemmas (verbs, roles) and NER (organizations)
+NEEDED_COMPONENTS = ("tok2vec", "tagger", "attribute_ruler", "lemmatizer", "ner")
+PIPE_BATCH_SIZE = int(os.getenv("LOR_NLP_BATCH_SIZE", "256"))
+PIPE_PROCESSES = int(os.getenv("LOR_NLP_PROCESSES", "1"))
+
+# Modifiers kept in front of a role word ("Technical Head", "Software Engineer")
+ROLE_MODIFIER_POS = ("PROPN", "NOUN", "ADJ")
+
+
+class TextUnderstanding:
+    """Roles, organizations and action verbs from student free text, via spaCy
+
+    Texts go through nlp.pipe in large batches with the parser and every
+    other unused component disabled. Features are cached per text by content
+    hash in an append-only JSON Lines file, so each distinct achievement or
+    position is only ever parsed once.
+    """
+
+    def __init__(self, keyword_tables, cache_dir=CACHE_DIR, model_name="en_core_web_md",
+                 batch_size=PIPE_BATCH_SIZE, n_process=PIPE_PROCESSES):
+        self.roles = keyword_tables.roles
+        self.cache_path = os.path.join(cache_dir, f"text_features-{model_name}.jsonl") if cache_dir else None
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self._features = None  # content hash -> {"roles", "orgs", "verbs"}
+        self._lock = threading.Lock()
+
+    def extract_many(self, texts):
+        """Features for each text, in order; only uncached texts are parsed"""
+        texts = [str(t) for t in texts]
+        with self._lock:
+            features = self._load_cache()
+            hashes = [_content_hash(t) for t in texts]
+            missing = {h: t for h, t in zip(hashes, texts) if h not in features}
+            if missing:
+                METRICS.inc("lor_nlp_cache_misses_total", len(missing))
+                with METRICS.stage("nlp_pipe", texts=len(missing)):
+                    parsed = list(zip(missing, self._parse(list(missing.values()))))
+                features.update(parsed)
+                self._append_cache(parsed)
+            METRICS.inc("lor_nlp_cache_hits_total", len(texts) - len(missing))
+            return [features[h] for h in hashes]
+
+    def student_insights(self, student, internships):
+        """Roles, organizations and action verbs across one student's texts"""
+        return self.insights_many([(student, internships)])[0]
+
+    def insights_many(self, students):
+        """student_insights for many (student, internships) pairs with one batched parse"""
+        per_student = []
+        texts = []
+        for student, internships in students:
+            achievements = [a for a in student.get("achievements") or [] if isinstance(a, str) and a.strip()]
+            positions = [i.get("position", "") for i in internships if i.get("position")]
+            skills = student.get("skills")
+            skills = [", ".join(skills)] if isinstance(skills, list) and skills else []
+            sources = achievements + positions + skills
+            per_student.append((len(texts), len(sources), len(achievements), internships))
+            texts.extend(sources)
+
+        features = self.extract_many(texts) if texts else []
+
+        insights = []
+        for start, count, achievement_count, internships in per_student:
+            roles, orgs, verbs = [], [], []
+            for feature in features[start:start + count]:
+                roles.extend(feature["roles"])
+                orgs.extend(feature["orgs"])
+            # Action verbs describe what the student did, so only achievements count
+            for feature in features[start:start + achievement_count]:
+                verbs.extend(feature["verbs"])
+            orgs.extend(i["company"] for i in internships if i.get("company"))
+            insights.append({
+                "roles": _unique(roles),
+                "organizations": _unique(orgs),
+                "actionVerbs": _unique(verbs),
+            })
+        return insights
+
+    def _parse(self, texts):
+        nlp = get_nlp()
+        disabled = [name for name in nlp.pipe_names if name not in NEEDED_COMPONENTS]
+        return [self._features_of(doc) for doc in nlp.pipe(texts, disable=disabled, batch_size=self.batch_size,
+                                                             n_process=self.n_process)]
+
+    def _features_of(self, doc):
+        roles = []
+        for token in doc:
+            if self.roles is None or not self.roles.any(token.lemma_):
+                continue
+            start = token.i
+            while start > 0 and token.i - start < 2 and doc[start - 1].pos_ in ROLE_MODIFIER_POS:
+                start -= 1
+            roles.append(doc[start:token.i + 1].text)
+        return {
+            "roles": roles,
+            "orgs": [ent.text for ent in doc.ents if ent.label_ == "ORG"],
+            "verbs": [token.lemma_.lower() for token in doc if token.pos_ == "VERB"],
+        }
+
+    def _load_cache(self):
+        if self._features is not None:
+            return self._features
+        self._features = {}
+        if self.cache_path and os.path.exists(self.cache_path):
+            with open(self.cache_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._features[entry["hash"]] = entry["features"]
+                    except (ValueError, KeyError):
+                        # A line cut short by a crash; that text is parsed again
+                        continue
+        return self._features
+
+    def _append_cache(self, parsed):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "a", encoding="utf-8") as f:
+                for content_hash, features in parsed:
+                    f.write(json.dumps({"hash": content_hash, "features": features}) + "\n")
+        except OSError as e:
+            print(f"Warning: could not write text feature cache {self.cache_path} ({e})", file=sys.stderr)
+
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _unique(values):
+    # Case-insensitive de-duplication that keeps the first spelling
+    seen = {}
+    for value in values:
+        seen.setdefault(value.strip().lower(), value.strip())
+    return [v for v in seen.values() if v]